@@ -11,7 +11,7 @@ def plot(batch_backup, subplot_spec):
     # ----------------- Data ------------------- #
 
     # Look at the parameters
-    n_simulations = len(batch_backup.backups)
+    n_simulations = batch_backup.n_runs
     n_positions = batch_backup.parameters["n_positions"]
 
     # Containers
@@ -20,22 +20,18 @@ def plot(batch_backup, subplot_spec):
     scores = np.zeros(n_simulations)
     r = np.zeros(n_simulations)
 
-    for i, b in enumerate(batch_backup.backups):
+    for chunk in batch_backup.chunks():
 
         # Compute the mean distance between the two firms
-        data = np.absolute(
-            b.positions[:, 0] -
-            b.positions[:, 1]) / n_positions
-
-        d[i] = np.mean(data)
+        d[chunk] = batch_backup.mean("distance", runs=chunk) / n_positions
 
         # Compute the mean price
-        prices[i] = np.mean(b.prices[:, :])
+        prices[chunk] = batch_backup.mean("prices", runs=chunk)
 
         # Compute the mean profit
-        scores[i] = np.mean(b.profits[:, :])
+        scores[chunk] = batch_backup.mean("profits", runs=chunk)
 
-        r[i] = b.parameters.r
+        r[chunk] = batch_backup.r[chunk]
 
     # ---------- Plot ----------------------------- #
 
@@ -21,10 +21,9 @@ def distance(pool_backup, fig_name=None, ax=None):
 
     # Shortcuts
     parameters = pool_backup.parameters
-    backups = pool_backup.backups
 
     # Look at the parameters
-    n_simulations = len(parameters["seed"])
+    n_simulations = pool_backup.n_runs
     n_positions = parameters["n_positions"]
     t_max = parameters["t_max"]
 
@@ -38,24 +37,19 @@ def distance(pool_backup, fig_name=None, ax=None):
     span_ratio = 0.33  # Take last third
     span = int(span_ratio * t_max)
 
-    for i, b in enumerate(backups):
+    # Means over the last time steps are computed from the segments of the runs, a chunk of runs at a time
+    for chunk in pool_backup.chunks():
 
-        x[i] = b.parameters.r
+        x[chunk] = pool_backup.r[chunk]
 
         # Compute the mean distance between the two firms
-        data = np.absolute(
-            b.positions[-span:, 0] -
-            b.positions[-span:, 1]) / n_positions
-
-        spacing = np.mean(data)
-
-        y[i] = spacing
+        y[chunk] = pool_backup.mean("distance", span=span, runs=chunk) / n_positions
 
         # Get std
-        y_err[i] = np.std(data)
+        y_err[chunk] = pool_backup.std("distance", span=span, runs=chunk) / n_positions
 
         # Get mean profits
-        z[i] = np.mean(b.profits[-span:, :])
+        z[chunk] = pool_backup.mean("profits", span=span, runs=chunk)
 
     # Plot this
     if ax is None:
@@ -16,11 +16,32 @@ from pylab import plt, np
 import os
 
 
+def _fill_bins(data, boundaries, pool_backup, column, span):
+
+    """
+    Put the mean of the last time steps of a column for each run in the bin of its 'r'
+    :param data: Values of each bin (list of lists, filled in place)
+    :param boundaries: Boundaries of the bins (np.array)
+    :param pool_backup: Backup of the pool (arbitrary Python object)
+    :param column: "prices" or "profits" (string)
+    :param span: Number of time steps from the end of the simulation (int)
+    """
+
+    for chunk in pool_backup.chunks():
+
+        # Bin of a run: first one whose upper boundary is superior or equal to 'r'
+        bins = np.searchsorted(boundaries[1:], pool_backup.r[chunk])
+        means = pool_backup.mean(column, span=span, runs=chunk)
+
+        for i, mean in zip(bins, means):
+            if i < len(data):
+                data[i].append(mean)
+
+
 def prices_over_fov(pool_backup, ax):
 
     # Shortcuts
     parameters = pool_backup.parameters
-    backups = pool_backup.backups
 
     # Look at the parameters
     t_max = parameters["t_max"]
@@ -38,15 +59,7 @@ def prices_over_fov(pool_backup, ax):
     # Container for data
     data = [[] for i in range(n_bins)]
 
-    for b in backups:
-
-        r = b.parameters.r
-
-        for i, bound in enumerate(boundaries[1:]):
-            if r <= bound:
-                d = np.mean(b.prices[-span:, :])
-                data[i].append(d)
-                break
+    _fill_bins(data=data, boundaries=boundaries, pool_backup=pool_backup, column="prices", span=span)
 
     mean_data = [np.mean(d) for d in data]
     std_data = [np.std(d) for d in data]
@@ -74,7 +87,6 @@ def profits_over_fov(pool_backup, ax):
 
     # Shortcuts
     parameters = pool_backup.parameters
-    backups = pool_backup.backups
 
     # Look at the parameters
     t_max = parameters["t_max"]
@@ -92,15 +104,7 @@ def profits_over_fov(pool_backup, ax):
     # Container for data
     data = [[] for i in range(n_bins)]
 
-    for b in backups:
-
-        r = b.parameters.r
-
-        for i, bound in enumerate(boundaries[1:]):
-            if r <= bound:
-                mean_profit = np.mean(b.profits[-span:, :])
-                data[i].append(mean_profit)
-                break
+    _fill_bins(data=data, boundaries=boundaries, pool_backup=pool_backup, column="profits", span=span)
 
     mean_data = [np.mean(d) for d in data]
     std_data = [np.std(d) for d in data]
@@ -64,42 +64,28 @@ class AbstractModel:
         (np.array of dimension n_position, n_position, 3).
         """
 
+        # Consumer x sees a firm located in i iff |x - i| <= r,
+        # so the consumers seeing a firm located in i are the ones in the field of view of i
+        field_of_view = np.asarray(self._field_of_view(np.arange(self.n_positions)))  # 2: min, max
+
+        n_seeing = field_of_view[1] - field_of_view[0] + 1
+
+        # Overlap of the two intervals of consumers
+        n_shared = np.maximum(
+            np.minimum(field_of_view[1][:, None], field_of_view[1][None, :]) -
+            np.maximum(field_of_view[0][:, None], field_of_view[0][None, :]) + 1,
+            0)
+
         z = np.zeros((self.n_positions, self.n_positions, 3), dtype=int)
         # Last parameter is idx0: n consumers seeing only A,
         #                   idx1: n consumers seeing only B,
         #                   idx2: consumers seeing A and B,
 
-        field_of_view = np.zeros((self.n_positions, 2))  # 2: min, max
-        field_of_view[:] = [self._field_of_view(x) for x in range(self.n_positions)]
-
-        max_n = 0
-
-        for i, j in itertools.combinations_with_replacement(range(self.n_positions), r=2):
-
-            n0, n1 = 0, 0
-            for x in range(self.n_positions):
-
-                see_firm_0 = field_of_view[x, 0] <= i <= field_of_view[x, 1]
-                see_firm_1 = field_of_view[x, 0] <= j <= field_of_view[x, 1]
-
-                if see_firm_0 and see_firm_1:
-                    z[i, j, 2] += 1
-                    n0 += 1
-                    n1 += 1
-
-                elif see_firm_0:
-                    z[i, j, 0] += 1
-                    n0 += 1
-
-                elif see_firm_1:
-                    z[i, j, 1] += 1
-                    n1 += 1
-
-            max_n = max(max_n, n0, n1)
+        z[:, :, 0] = n_seeing[:, None] - n_shared
+        z[:, :, 1] = n_seeing[None, :] - n_shared
+        z[:, :, 2] = n_shared
 
-            z[j, i, 0] = z[i, j, 1]
-            z[j, i, 1] = z[i, j, 0]
-            z[j, i, 2] = z[i, j, 2]
+        max_n = int(np.max(n_seeing))
 
         return z, max_n
 
@@ -107,19 +93,42 @@ class AbstractModel:
 
         """
         Compute the field of view for a consumer
-        :param x: Position of the consumer (int)
+        :param x: Position of the consumer (int or np.array of positions)
         :return: Min and max of the field of view (list)
         """
 
         r = int(self.r * self.n_positions)
 
         field_of_view = [
-            max(x - r, 0),
-            min(x + r, self.n_positions - 1)
+            np.maximum(x - r, 0),
+            np.minimum(x + r, self.n_positions - 1)
         ]
 
         return field_of_view
 
+    def _compute_profits(self):
+
+        """
+        Compute expected profits for every combination of moves (as '_profits_given_position_and_price').
+        :return: Expected profits of firm 0 and firm 1 (np.array of dimension n_strategies, n_strategies, 2)
+        """
+
+        pos, price = self.strategies[:, 0], self.strategies[:, 1]
+
+        price0, price1 = np.broadcast_arrays(price[:, None], price[None, :])
+
+        z = self.n_consumers[pos[:, None], pos[None, :]]
+        to_share = z[:, :, 2]
+
+        n_consumers = np.zeros((self.n_strategies, self.n_strategies, 2))
+        n_consumers[:] = z[:, :, :2]
+
+        # Shared consumers go to the cheapest firm, or are split if prices are equal
+        n_consumers[:, :, 0] += np.where(price0 == price1, to_share / 2, np.where(price0 < price1, to_share, 0))
+        n_consumers[:, :, 1] += np.where(price0 == price1, to_share / 2, np.where(price1 < price0, to_share, 0))
+
+        return n_consumers * self.prices[np.stack((price0, price1), axis=-1)]
+
     def _profits_given_position_and_price(self, move0, move1, n_consumers=None):
 
         """
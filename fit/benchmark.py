@@ -0,0 +1,136 @@
+import timeit
+import numpy as np
+
+from fit import score
+
+
+def score_cost(r=0.25, n_decisions=10000, repeat=5, seed=0):
+
+    """
+    Time of scoring a decision with each heuristic, the moves being drawn at random
+    :param r: Parameter 'r' of the model (float)
+    :param n_decisions: Number of decisions scored (int)
+    :param repeat: Number of repetitions, the fastest one being kept (int)
+    :param seed: Seed of the random moves (int)
+    :return: Time of building the score matrices, and for each heuristic, time per decision
+        when scoring one decision at a time and when scoring every decision at once (tuple of float and dictionary)
+    """
+
+    build = min(timeit.repeat(lambda: score.Score(r=r), number=1, repeat=repeat))
+
+    dm_model = score.Score(r=r)
+
+    rng = np.random.default_rng(seed)
+    moves = dm_model.strategies[rng.integers(dm_model.n_strategies, size=(2, n_decisions))]
+
+    # Prices in 'strategies' are indices of prices, not prices themselves
+    player_positions, player_prices = moves[0, :, 0], moves[0, :, 1] + dm_model.p_min
+    opp_positions, opp_prices = moves[1, :, 0], moves[1, :, 1] + dm_model.p_min
+
+    decisions = list(zip(
+        player_positions.tolist(), player_prices.tolist(), opp_positions.tolist(), opp_prices.tolist()))
+
+    costs = {}
+
+    for str_method in score.Score.names:
+
+        method = getattr(dm_model, str_method)
+
+        one_at_a_time = min(timeit.repeat(
+            lambda: [method(*decision) for decision in decisions], number=1, repeat=repeat))
+
+        all_at_once = min(timeit.repeat(
+            lambda: method(player_positions, player_prices, opp_positions, opp_prices), number=1, repeat=repeat))
+
+        costs[str_method] = one_at_a_time / n_decisions, all_at_once / n_decisions
+
+    return build, costs
+
+
+def _looped_scores(dm_model, str_method, opp_move):
+
+    """
+    Scores of every move of the player given a move of the opponent for a strategic heuristic,
+    computed as before the lookahead tables: n_strategies * n_strategies evaluations of the profits
+    :return: Scores (np.array of length n_strategies)
+    """
+
+    values = np.zeros(dm_model.n_strategies)
+    profits_t_plus = np.zeros((dm_model.n_strategies, 2))
+
+    for i in range(dm_model.n_strategies):
+
+        profits_t = dm_model._profits_given_position_and_price(i, opp_move)
+
+        for j in range(dm_model.n_strategies):
+            profits_t_plus[j] = dm_model._profits_given_position_and_price(i, j)
+
+        if str_method == "max_profit_strategic":
+            opp_values = profits_t_plus[:, 1]
+            values[i] = profits_t[0] + np.mean(profits_t_plus[opp_values == max(opp_values), 0])
+
+        else:
+            opp_values = profits_t_plus[:, 1] - profits_t_plus[:, 0]
+            delta_t_plus = profits_t_plus[:, 0] - profits_t_plus[:, 1]
+            values[i] = profits_t[0] - profits_t[1] + np.mean(delta_t_plus[opp_values == max(opp_values)])
+
+    max_value = max(values)
+
+    if str_method == "max_diff_strategic":
+        values = np.maximum(0, values)
+
+    return values / max_value if max_value > 0 else np.ones(dm_model.n_strategies)
+
+
+def check_strategic_scores(r_values=(0.25, 0.5), n_moves=3, seed=0):
+
+    """
+    Check the lookahead tables of the strategic heuristics against the former computation, for a few moves
+    of the opponent (every move of the player being scored)
+    :param r_values: Values of 'r' (tuple)
+    :param n_moves: Number of moves of the opponent for each 'r', drawn at random (int)
+    :param seed: Seed of the random moves (int)
+    :return: For each strategic heuristic, largest difference with the former scores
+        and time of the former computation per decision (dictionary of tuples)
+    """
+
+    rng = np.random.default_rng(seed)
+
+    errors = {str_method: 0. for str_method in score.Score.strategic_names}
+    times = {str_method: [] for str_method in score.Score.strategic_names}
+
+    for r in r_values:
+
+        dm_model = score.Score(r=r)
+
+        for opp_move in rng.integers(dm_model.n_strategies, size=n_moves):
+
+            for str_method in score.Score.strategic_names:
+
+                t = timeit.default_timer()
+                looped = _looped_scores(dm_model, str_method, opp_move)
+                times[str_method].append(timeit.default_timer() - t)
+
+                error = np.max(np.absolute(dm_model.scores[str_method][opp_move] - looped))
+                errors[str_method] = max(errors[str_method], error)
+
+                assert error == 0, "Scores of '{}' differ from the former ones (r={}, opponent's move {}).".format(
+                    str_method, r, opp_move)
+
+    return {str_method: (float(errors[str_method]), float(np.mean(times[str_method]))) for str_method in errors}
+
+
+def main():
+
+    """
+    :return: Time of building the score matrices, time per decision for each heuristic (see 'score_cost')
+        and check of the strategic heuristics (see 'check_strategic_scores') (dictionary)
+    """
+
+    build, costs = score_cost()
+
+    return {"build": build, "costs": costs, "check": check_strategic_scores()}
+
+
+if __name__ == "__main__":
+    print(main())
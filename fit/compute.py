@@ -3,6 +3,7 @@ from tqdm import tqdm
 
 from behavior import backup
 from fit import score
+from simulation import executor
 
 
 class BackupFit:
@@ -54,18 +55,28 @@ class RunModel:
         return np.mean(scores)
 
 
-def get_fit(force):
+def register_players(fit_backup, backups):
 
-    backups = backup.get_data(force)
+    """
+    Register the information of each player of each round, one player after the other
+    :param fit_backup: Backup with an array of length n_players for each information (arbitrary Python object)
+    :param backups: Backups of the rounds (list)
+    """
 
-    backups = [b for b in backups if b.pvp]
+    fit_backup.display_opponent_score[:] = np.repeat([b.display_opponent_score for b in backups], 2)
+    fit_backup.r[:] = np.repeat([b.r for b in backups], 2)
+    fit_backup.score[:] = np.sum([b.profits for b in backups], axis=1).ravel()
+    fit_backup.user_id[:] = np.ravel([b.user_id for b in backups])
+    fit_backup.room_id[:] = np.repeat([b.room_id for b in backups], 2)
+    fit_backup.round_id[:] = np.repeat([b.round_id for b in backups], 2)
+    fit_backup.firm_id[:] = np.tile((0, 1), len(backups))
 
-    m = {
-        0.25: score.Score(r=0.25),
-        0.50: score.Score(r=0.5)
-    }
 
-    fit_backup = BackupFit(size=len(backups*2))
+def _fit_by_player(fit_backup, backups, m):
+
+    """
+    Compute the mean score of each player for each heuristic, time step by time step
+    """
 
     with tqdm(total=len(backups*2)) as pbar:
 
@@ -75,15 +86,6 @@ def get_fit(force):
 
             for player in (0, 1):
 
-                # Register information
-                fit_backup.display_opponent_score[i] = b.display_opponent_score
-                fit_backup.r[i] = b.r
-                fit_backup.score[i] = np.sum(b.profits[:, player])
-                fit_backup.user_id[i] = b.user_id[player]
-                fit_backup.room_id[i] = b.room_id
-                fit_backup.round_id[i] = b.round_id
-                fit_backup.firm_id[i] = player
-
                 # Compute score
                 kwargs = {
                     "dm_model": m[b.r],
@@ -108,6 +110,130 @@ def get_fit(force):
 
                 tqdm.write("\n")
 
+
+# Models of a worker process, for each 'r' (built once by '_init_worker')
+_worker_models = {}
+
+
+def _init_worker(r_values):
+
+    for r in r_values:
+        _worker_models[r] = score.Score(r=r)
+
+
+def _fit_player(task):
+
+    r, firm_id, active_player_t0, positions, prices, t_max = task
+
+    kwargs = {
+        "dm_model": _worker_models[r],
+        "firm_id": firm_id,
+        "active_player_t0": active_player_t0,
+        "positions": positions,
+        "prices": prices,
+        "t_max": t_max
+    }
+
+    return [RunModel(**kwargs, str_method=str_method).run() for str_method in score.Score.names]
+
+
+def _fit_in_parallel(fit_backup, backups, n_workers, chunksize):
+
+    """
+    Compute the mean score of each player for each heuristic as '_fit_by_player',
+    with the players shared between worker processes (results are gathered in the same order)
+    """
+
+    tasks = [
+        (b.r, player, b.active_player_t0, b.positions, b.prices, b.t_max) for b in backups for player in (0, 1)]
+
+    r_values = sorted({b.r for b in backups})
+
+    with executor.Executor(
+            n_workers=n_workers, chunksize=chunksize, initializer=_init_worker, initargs=(r_values, )) as exe:
+        results = exe.map(_fit_player, tasks)
+
+    for j, str_method in enumerate(score.Score.names):
+        fit_backup.fit_scores[str_method][:] = [player_scores[j] for player_scores in results]
+
+
+def _fit_vectorized(fit_backup, backups, m):
+
+    """
+    Compute the mean score of each player for each heuristic, for all the rounds at once
+    (same values as '_fit_by_player')
+    """
+
+    positions = np.array([b.positions for b in backups])  # n_rounds, t_max, 2
+    prices = np.array([b.prices for b in backups])
+    active_player_t0 = np.array([b.active_player_t0 for b in backups])
+    r = np.array([b.r for b in backups])
+
+    # Moves do not depend on 'r'
+    moves = next(iter(m.values())).get_moves(positions, prices)
+
+    fit_scores = {str_method: np.zeros((len(backups), 2)) for str_method in score.Score.names}
+
+    for player in (0, 1):
+
+        opp = (player + 1) % 2
+
+        # Players play in turn: a player is active every two time steps, starting at time step 0 or 1
+        first_t = (player - active_player_t0) % 2
+
+        for r_value, dm_model in m.items():
+
+            for t0 in (0, 1):
+
+                rounds = (r == r_value) & (first_t == t0)
+
+                player_moves = moves[rounds, t0::2, player]
+                opp_moves = moves[rounds, t0::2, opp]
+
+                for str_method in score.Score.names:
+                    scores = dm_model.scores[str_method][opp_moves, player_moves]
+                    fit_scores[str_method][rounds, player] = np.mean(scores, axis=1)
+
+    for str_method in score.Score.names:
+        fit_backup.fit_scores[str_method][:] = fit_scores[str_method].ravel()
+
+
+def get_fit(force, vectorized=True, n_workers=None, chunksize=None):
+
+    """
+    Compute the mean score of each player of each pvp round for each heuristic
+    :param force: Load the data from the database instead of the pickle file (bool)
+    :param vectorized: Compute the scores of all the rounds at once, instead of player by player (bool)
+    :param n_workers: If not vectorized, share the players between this number of worker processes
+        (int; default: players are fitted in the current process)
+    :param chunksize: Number of players sent at once to a worker (int; default: a few chunks per worker)
+    :return: A fit backup (arbitrary Python object)
+    """
+
+    backups = backup.get_data(force)
+
+    backups = [b for b in backups if b.pvp]
+
+    fit_backup = BackupFit(size=len(backups*2))
+
+    register_players(fit_backup, backups)
+
+    if not vectorized and n_workers is not None:
+        _fit_in_parallel(fit_backup, backups, n_workers=n_workers, chunksize=chunksize)
+
+    else:
+
+        m = {
+            0.25: score.Score(r=0.25),
+            0.50: score.Score(r=0.5)
+        }
+
+        if vectorized:
+            _fit_vectorized(fit_backup, backups, m)
+
+        else:
+            _fit_by_player(fit_backup, backups, m)
+
     backup.save(fit_backup, "data/fit.p")
 
     return fit_backup
@@ -11,11 +11,11 @@ from behavior import backup
 
 def get(force=False):
 
-    if not os.path.exists("data/fit.p") or force:
-        fit_b = compute.get_fit(force)
+    fit_b = None if force or not os.path.exists("data/fit.p") else backup.load("data/fit.p")
 
-    else:
-        fit_b = backup.load("data/fit.p")
+    # A fit saved before the heuristics changed lacks some of their scores
+    if fit_b is None or set(fit_b.fit_scores) != set(score.Score.names):
+        fit_b = compute.get_fit(force)
 
     r_values = np.sort(np.unique(fit_b.r))
     s_values = (False, True)
@@ -24,7 +24,7 @@ def get(force=False):
 
     data = []
 
-    scores_to_plot = score.Score.names  # fit.Score.names
+    scores_to_plot = score.Score.myopic_names
     n_dim = len(scores_to_plot)
 
     for r_value, s_value in exp_conditions:
@@ -36,7 +36,7 @@ def get(force=False):
     room_id = np.zeros(n, dtype=int)
     round_id = np.zeros(n, dtype=int)
     
-    d = {i: np.zeros(n) for i in score.Score.names}
+    d = {i: np.zeros(n) for i in score.Score.myopic_names}
 
     r = np.zeros(n)
 
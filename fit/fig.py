@@ -5,11 +5,12 @@ import itertools as it
 
 from analysis.profiling import ind_profiles
 from analysis.batch import customized_plot
+from fit import score
 
 
 def ind_plots(fit_b):
 
-    scores_to_plot = ["profit", "competition"]  # fit.Score.names
+    scores_to_plot = score.Score.myopic_names[:2]
     n_dim = len(scores_to_plot)
     colors = ["C{}".format(i + 2) for i in range(n_dim)]
 
@@ -26,9 +27,9 @@ def ind_plots(fit_b):
 
             data = np.zeros((n, n_dim))
 
-            for j, score in enumerate(scores_to_plot):
+            for j, sc in enumerate(scores_to_plot):
 
-                data[:, j] = fit_b.fit_scores[score][cond]
+                data[:, j] = fit_b.fit_scores[sc][cond]
 
             idx = np.argsort(data[:, 1])[::-1]
 
@@ -48,7 +49,7 @@ def scores_distribution(data, subplot_spec):
 
     positions = it.product(range(2), repeat=2)
 
-    scores_to_plot = ["profit", "competition", "equal_sharing"]  # fit.Score.names
+    scores_to_plot = score.Score.myopic_names
     n_dim = len(scores_to_plot)
 
     colors = ["C{}".format(i + 2) for i in range(n_dim)]
@@ -0,0 +1,238 @@
+"""
+Likelihood of the decisions of the players under stochastic versions of each heuristic:
+- 'softmax': a move is chosen with a probability proportional to exp(score / temperature);
+- 'epsilon_greedy': one of the moves of best score is chosen, except with probability epsilon
+  where any move is chosen (uniformly).
+The parameter of each player (one player of one pvp round) is fitted by maximum likelihood:
+on a grid shared by all the players first, then refined for each player by a bounded scalar optimizer.
+"""
+
+import numpy as np
+from scipy import optimize, special
+
+from behavior import backup
+from fit import compute
+from fit import score
+
+
+models = "softmax", "epsilon_greedy"
+
+# Bounds of the parameter of each model (for 'softmax', the ones of the former search of the temperature)
+bounds = {
+    "softmax": (0.0015, 0.2),
+    "epsilon_greedy": (0.001, 1.)
+}
+
+
+class BackupLikelihood:
+
+    def __init__(self, size):
+
+        self.display_opponent_score = np.zeros(size, dtype=bool)
+        self.r = np.zeros(size)
+        self.firm_id = np.zeros(size, dtype=int)
+        self.user_id = np.zeros(size, dtype=int)
+        self.room_id = np.zeros(size, dtype=int)
+        self.round_id = np.zeros(size, dtype=int)
+        self.score = np.zeros(size, dtype=int)
+
+        self.n_decisions = np.zeros(size, dtype=int)
+
+        # For each model and each heuristic, best parameter of each player and log-likelihood of its decisions
+        # (NaN for the players that are not fitted, e.g. if there is no model for their 'r')
+        self.parameter = {model: {i: np.full(size, np.nan) for i in score.Score.names} for model in models}
+        self.log_likelihood = {model: {i: np.full(size, np.nan) for i in score.Score.names} for model in models}
+
+
+def softmax_log_likelihoods(scores, opp_moves, player_moves, temps):
+
+    """
+    :param scores: Score of each move of the player (columns) given the move of the opponent (rows)
+        (np.array of dimension n_strategies, n_strategies)
+    :param opp_moves: Move of the opponent for each decision (np.array)
+    :param player_moves: Move of the player for each decision (np.array)
+    :param temps: Temperatures (np.array)
+    :return: Log-likelihood of each decision for each temperature (np.array of dimension n_temps, n_decisions)
+    """
+
+    temps = np.asarray(temps, dtype=float)[:, None]
+
+    # Normalization constant, only for the moves of the opponent met in the decisions
+    rows, inverse = np.unique(opp_moves, return_inverse=True)
+    log_z = special.logsumexp(scores[rows][None, :, :] / temps[:, :, None], axis=2)
+
+    return scores[opp_moves, player_moves][None, :] / temps - log_z[:, inverse]
+
+
+def epsilon_greedy_log_likelihoods(scores, opp_moves, player_moves, epsilons):
+
+    """
+    :param scores: Score of each move of the player (columns) given the move of the opponent (rows)
+        (np.array of dimension n_strategies, n_strategies)
+    :param opp_moves: Move of the opponent for each decision (np.array)
+    :param player_moves: Move of the player for each decision (np.array)
+    :param epsilons: Probabilities of choosing a move at random (np.array)
+    :return: Log-likelihood of each decision for each epsilon (np.array of dimension n_epsilons, n_decisions)
+    """
+
+    epsilons = np.asarray(epsilons, dtype=float)[:, None]
+
+    best = scores == np.max(scores, axis=1, keepdims=True)
+    p_greedy = best[opp_moves, player_moves] / np.sum(best, axis=1)[opp_moves]
+
+    return np.log((1 - epsilons) * p_greedy[None, :] + epsilons / scores.shape[1])
+
+
+_log_likelihood_functions = {
+    "softmax": softmax_log_likelihoods,
+    "epsilon_greedy": epsilon_greedy_log_likelihoods
+}
+
+
+def log_likelihoods(model, scores, opp_moves, player_moves, parameters):
+
+    """
+    :param model: Name of the model ('softmax' or 'epsilon_greedy')
+    :return: Log-likelihood of each decision for each parameter (np.array of dimension n_parameters, n_decisions)
+    """
+
+    return _log_likelihood_functions[model](scores, opp_moves, player_moves, parameters)
+
+
+def get_decisions(backups, dm_model):
+
+    """
+    Decisions of each player of each round: moves of the opponent and of the player at the time steps
+    where this player is active (players being indexed as in 'compute.BackupFit')
+    :param backups: Backups of the rounds (list)
+    :param dm_model: Any model (moves do not depend on 'r')
+    :return: Index of the player, move of the opponent and move of the player for each decision (tuple of np.array)
+    """
+
+    positions = np.array([b.positions for b in backups])  # n_rounds, t_max, 2
+    prices = np.array([b.prices for b in backups])
+    active_player_t0 = np.array([b.active_player_t0 for b in backups])
+
+    moves = dm_model.get_moves(positions, prices)
+
+    t = np.arange(moves.shape[1])
+
+    players, opp_moves, player_moves = [], [], []
+
+    for player in (0, 1):
+
+        opp = (player + 1) % 2
+
+        # Players play in turn, starting with 'active_player_t0'
+        rounds, steps = np.nonzero((t[None, :] + active_player_t0[:, None] - player) % 2 == 0)
+
+        players.append(rounds * 2 + player)
+        opp_moves.append(moves[rounds, steps, opp])
+        player_moves.append(moves[rounds, steps, player])
+
+    order = np.argsort(np.concatenate(players), kind="stable")
+
+    return tuple(np.concatenate(a)[order] for a in (players, opp_moves, player_moves))
+
+
+def fit_players(model, scores, players, opp_moves, player_moves, n_players, n_grid=64, refine=True):
+
+    """
+    Maximum likelihood estimate of the parameter of each player
+    :param model: Name of the model ('softmax' or 'epsilon_greedy')
+    :param scores: Score of each move of the player given the move of the opponent (np.array)
+    :param players: Index of the player of each decision (np.array)
+    :param opp_moves: Move of the opponent for each decision (np.array)
+    :param player_moves: Move of the player for each decision (np.array)
+    :param n_players: Number of players (int)
+    :param n_grid: Number of points of the grid of parameters, evenly spaced on a log scale (int)
+    :param refine: Refine the estimate of each player between the neighbours of its best point of the grid (bool)
+    :return: Best parameter and log-likelihood of the decisions of each player (tuple of np.array)
+    """
+
+    grid = np.geomspace(*bounds[model], n_grid)
+
+    # Log-likelihood of the decisions of each player for each parameter
+    ll = log_likelihoods(model, scores, opp_moves, player_moves, grid)
+    ll = np.stack([np.bincount(players, weights=row, minlength=n_players) for row in ll])
+
+    best = np.argmax(ll, axis=0)
+
+    parameter = grid[best]
+    log_likelihood = ll[best, np.arange(n_players)]
+
+    if refine:
+
+        starts = np.searchsorted(players, np.arange(n_players + 1))
+
+        for i in np.flatnonzero(np.diff(starts)):
+
+            decisions = slice(starts[i], starts[i + 1])
+
+            def neg_log_likelihood(log_parameter):
+                return - np.sum(log_likelihoods(
+                    model, scores, opp_moves[decisions], player_moves[decisions], [np.exp(log_parameter)]))
+
+            bracket = np.log(grid[[max(best[i] - 1, 0), min(best[i] + 1, n_grid - 1)]])
+
+            res = optimize.minimize_scalar(neg_log_likelihood, bounds=bracket, method="bounded")
+
+            if - res.fun > log_likelihood[i]:
+                parameter[i] = np.exp(res.x)
+                log_likelihood[i] = - res.fun
+
+    return parameter, log_likelihood
+
+
+def get_fit(force, n_grid=64, refine=True):
+
+    """
+    Fit the parameter of each model for each heuristic, for each player of each pvp round
+    :param force: Load the data from the database instead of the pickle file (bool)
+    :param n_grid: See 'fit_players' (int)
+    :param refine: See 'fit_players' (bool)
+    :return: A likelihood backup (arbitrary Python object)
+    """
+
+    backups = backup.get_data(force)
+
+    backups = [b for b in backups if b.pvp]
+
+    n_players = len(backups) * 2
+
+    likelihood_backup = BackupLikelihood(size=n_players)
+
+    compute.register_players(likelihood_backup, backups)
+
+    m = {
+        0.25: score.Score(r=0.25),
+        0.50: score.Score(r=0.5)
+    }
+
+    players, opp_moves, player_moves = get_decisions(backups, next(iter(m.values())))
+
+    likelihood_backup.n_decisions[:] = np.bincount(players, minlength=n_players)
+
+    r = likelihood_backup.r[players]
+
+    for r_value, dm_model in m.items():
+
+        decisions = r == r_value
+
+        for model in models:
+
+            for str_method in score.Score.names:
+
+                parameter, log_likelihood = fit_players(
+                    model, dm_model.scores[str_method],
+                    players[decisions], opp_moves[decisions], player_moves[decisions],
+                    n_players=n_players, n_grid=n_grid, refine=refine)
+
+                fitted = likelihood_backup.r == r_value
+
+                likelihood_backup.parameter[model][str_method][fitted] = parameter[fitted]
+                likelihood_backup.log_likelihood[model][str_method][fitted] = log_likelihood[fitted]
+
+    backup.save(likelihood_backup, "data/likelihood.p")
+
+    return likelihood_backup
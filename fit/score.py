@@ -18,11 +18,30 @@ from fit import abstract
 
 class Score(abstract.AbstractModel):
 
-    names = "max_profit", "max_diff", "equal_sharing"  # "profit_strategic", "competition_strategic"
+    """
+    Score of a move of a player given the move of the opponent, for each heuristic:
+    the scores of every move given every move of the opponent are computed once (one matrix by heuristic),
+    so that scoring a move is a single read.
+    """
+
+    # Heuristics only considering the current move of the opponent
+    myopic_names = "max_profit", "max_diff", "equal_sharing"
+
+    # Heuristics also considering the best response of the opponent at the next time step
+    strategic_names = "max_profit_strategic", "max_diff_strategic"
+
+    names = myopic_names + strategic_names
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        # Expected profits of the player and of the opponent, for each move of the opponent (first dimension)
+        # and each move of the player (second dimension)
+        exp_profits = self._compute_profits().transpose((1, 0, 2))
+
+        # For each heuristic, score of each move of the player (columns) given the move of the opponent (rows)
+        self.scores = {name: getattr(self, "_{}_scores".format(name))(exp_profits) for name in self.names}
+
     # @staticmethod
     # def _softmax(values, temp):
     #
@@ -30,114 +49,108 @@ class Score(abstract.AbstractModel):
     #     dist = e / np.sum(e)
     #     return dist
 
-    def _get_expected_profits(self, opp_position, opp_price):
+    @staticmethod
+    def _normalize(player_values, max_values):
 
-        opp_move = self.convert_to_strategies[(opp_position, opp_price)]
+        # Score is 1 for every move if no move has a positive value
+        max_values = max_values[:, None]
 
-        exp_profits = np.zeros((self.n_strategies, 2))
+        return np.where(max_values > 0, player_values / np.where(max_values > 0, max_values, 1), 1)
 
-        for i in range(self.n_strategies):
-            exp_profits[i] = self._profits_given_position_and_price(i, opp_move)
+    def _max_profit_scores(self, exp_profits):
 
-        return exp_profits
+        exp_profits = exp_profits[:, :, 0]
 
-    def max_profit(self, player_position, player_price, opp_position, opp_price):
+        return self._normalize(exp_profits, np.max(exp_profits, axis=1))
 
-        player_move = self.convert_to_strategies[(player_position, player_price)]
-        exp_profits = self._get_expected_profits(opp_position=opp_position, opp_price=opp_price)[:, 0]
+    def _max_diff_scores(self, exp_profits):
 
-        max_value = max(exp_profits)
-        player_value = exp_profits[player_move]
+        profits_differences = exp_profits[:, :, 0] - exp_profits[:, :, 1]
 
-        score = player_value / max_value if max_value > 0 else 1
+        return self._normalize(np.maximum(0, profits_differences), np.max(profits_differences, axis=1))
 
-        return score
+    def _equal_sharing_scores(self, exp_profits):
 
-    def max_diff(self, player_position, player_price, opp_position, opp_price):
+        max_profits = np.max(exp_profits, axis=1, keepdims=True)
 
-        player_move = self.convert_to_strategies[(player_position, player_price)]
-        exp_profits = self._get_expected_profits(opp_position=opp_position, opp_price=opp_price)
+        diff = np.sum(max_profits - exp_profits, axis=2)
 
-        profits_differences = exp_profits[:, 0] - exp_profits[:, 1]
+        max_value = np.max(diff, axis=1)
 
-        max_value = max(profits_differences)
-        player_value = max(0, profits_differences[player_move])
+        return self._normalize(max_value[:, None] - diff, max_value)
 
-        return player_value / max_value if max_value > 0 else 1
-    
-    def equal_sharing(self, player_position, player_price, opp_position, opp_price):
+    @staticmethod
+    def _lookahead(follow_up_values, opp_values):
 
-        player_move = self.convert_to_strategies[(player_position, player_price)]
+        """
+        For each move of the player, mean value at the next time step given the best responses of the opponent
+        :param follow_up_values: Value for the player of each move of the player (rows) and response of the opponent
+            (np.array of dimension n_strategies, n_strategies)
+        :param opp_values: Value for the opponent, which chooses the responses maximizing it (same dimension)
+        :return: Mean value for each move of the player (np.array)
+        """
 
-        exp_profits = self._get_expected_profits(opp_position, opp_price)
+        return np.array([
+            np.mean(follow_up[opp == np.max(opp)]) for follow_up, opp in zip(follow_up_values, opp_values)])
 
-        max_profits_0 = max(exp_profits[:, 0])
-        max_profits_1 = max(exp_profits[:, 1])
+    def _max_profit_strategic_scores(self, exp_profits):
 
-        diff_max_0 = max_profits_0 - exp_profits[:, 0]
-        diff_max_1 = max_profits_1 - exp_profits[:, 1]
+        # Profits of the player and of the opponent at the next time step,
+        # for each move of the player (first dimension) and each response of the opponent (second dimension)
+        follow_up = exp_profits.transpose((1, 0, 2))
 
-        diff = diff_max_0 + diff_max_1
+        values = exp_profits[:, :, 0] + self._lookahead(follow_up[:, :, 0], follow_up[:, :, 1])[None, :]
 
-        max_value = max(diff)
-        player_value = max_value - diff[player_move]
+        return self._normalize(values, np.max(values, axis=1))
 
-        return player_value / max_value if max_value > 0 else 1
+    def _max_diff_strategic_scores(self, exp_profits):
 
-    # def max_profit_strategic(self, player_position, player_price, opp_position, opp_price):
-    #
-    #     player_move = self.convert_to_strategies[(player_position, player_price)]
-    #     opp_move = self.convert_to_strategies[(opp_position, opp_price)]
-    #
-    #     values = np.zeros(self.n_strategies)
-    #
-    #     profits_t_plus = np.zeros((self.n_strategies, 2))
-    #
-    #     for i in range(self.n_strategies):
-    #         profits_t = self._profits_given_position_and_price(i, opp_move)[0]
-    #         for j in range(self.n_strategies):
-    #             profits_t_plus[j] = self._profits_given_position_and_price(i, j)
-    #
-    #         max_profits_opp = max(profits_t_plus[:, 1])
-    #         mean_profits_t_plus = np.mean(profits_t_plus[profits_t_plus[:, 1] == max_profits_opp, 0])
-    #         values[i] = profits_t + mean_profits_t_plus
-    #
-    #     max_value = max(values)
-    #     player_value = values[player_move]
-    #
-    #     return player_value / max_value if max_value > 0 else 1
-    #
-    # def max_diff_strategic(self, player_position, player_price, opp_position, opp_price):
-    #
-    #     player_move = self.convert_to_strategies[(player_position, player_price)]
-    #     opp_move = self.convert_to_strategies[(opp_position, opp_price)]
-    #
-    #     values = np.zeros(self.n_strategies)
-    #
-    #     profits_t_plus = np.zeros((self.n_strategies, 2))
-    #     delta_t_plus = np.zeros((self.n_strategies, 2))
-    #
-    #     for i in range(self.n_strategies):
-    #
-    #         profits_t = self._profits_given_position_and_price(i, opp_move)
-    #         delta_t = profits_t[0] - profits_t[1]
-    #
-    #         # print("delta t", delta_t)
-    #
-    #         for j in range(self.n_strategies):
-    #             profits_t_plus[j] = self._profits_given_position_and_price(i, j)
-    #             delta_t_plus[j, 1] = profits_t_plus[j, 1] - profits_t_plus[j, 0]
-    #             delta_t_plus[j, 0] = profits_t_plus[j, 0] - profits_t_plus[j, 1]
-    #
-    #         max_delta_opp = max(delta_t_plus[:, 1])
-    #         mean_delta_t_plus = np.mean(delta_t_plus[delta_t_plus[:, 1] == max_delta_opp, 0])
-    #
-    #         #  print("mean delta t plus", mean_delta_t_plus)
-    #
-    #         values[i] = delta_t + mean_delta_t_plus
-    #
-    #     max_value = max(values)  # Why always 21?
-    #     player_value = max(0, values[player_move])
-    #
-    #     return player_value / max_value if max_value > 0 else 1
+        follow_up = exp_profits.transpose((1, 0, 2))
+
+        delta_t = exp_profits[:, :, 0] - exp_profits[:, :, 1]
+        delta_t_plus = follow_up[:, :, 0] - follow_up[:, :, 1]
+
+        values = delta_t + self._lookahead(delta_t_plus, follow_up[:, :, 1] - follow_up[:, :, 0])[None, :]
+
+        return self._normalize(np.maximum(0, values), np.max(values, axis=1))
+
+    def get_moves(self, positions, prices):
+
+        """
+        Convert positions and prices to moves (as 'convert_to_strategies')
+        :param positions: Positions (int or np.array)
+        :param prices: Prices, not their indices (int or np.array)
+        :return: Moves (int or np.array)
+        """
+
+        return np.asarray(positions) * self.n_prices + np.asarray(prices) - self.p_min
+
+    def score(self, str_method, player_position, player_price, opp_position, opp_price):
+
+        """
+        :param str_method: Name of the heuristic (string)
+        :return: Score of the move of the player (float or np.array, depending on the arguments)
+        """
+
+        return self.scores[str_method][
+            self.get_moves(opp_position, opp_price), self.get_moves(player_position, player_price)]
+
+    def max_profit(self, player_position, player_price, opp_position, opp_price):
+
+        return self.score("max_profit", player_position, player_price, opp_position, opp_price)
+
+    def max_diff(self, player_position, player_price, opp_position, opp_price):
+
+        return self.score("max_diff", player_position, player_price, opp_position, opp_price)
+
+    def equal_sharing(self, player_position, player_price, opp_position, opp_price):
+
+        return self.score("equal_sharing", player_position, player_price, opp_position, opp_price)
+
+    def max_profit_strategic(self, player_position, player_price, opp_position, opp_price):
+
+        return self.score("max_profit_strategic", player_position, player_price, opp_position, opp_price)
+
+    def max_diff_strategic(self, player_position, player_price, opp_position, opp_price):
 
+        return self.score("max_diff_strategic", player_position, player_price, opp_position, opp_price)
@@ -1,44 +1,44 @@
 import scipy.stats
 import statsmodels.stats.multitest
 
+from fit import score
+
 
 def stats_and_table(fit_b):
 
     r = fit_b.r
     s = fit_b.display_opponent_score
 
-    p = fit_b.fit_scores["profit"]
-    d = fit_b.fit_scores["competition"]
-    e = fit_b.fit_scores["equal_sharing"]
+    p, d, e = (fit_b.fit_scores[name] for name in score.Score.myopic_names)
 
     to_compare = []
 
-    for name, score in [("Profit maximization", p),
-                        ("Difference maximization", d),
-                        ("Tacit collusion", e)]:
+    for name, sc in [("Profit maximization", p),
+                     ("Difference maximization", d),
+                     ("Tacit collusion", e)]:
         to_compare.append({
             "measure": name,
             "constant": "s = 0",
             "var": "r",
-            "data": [score[(r == r_value) * (s == 0)] for r_value in (0.25, 0.50)]
+            "data": [sc[(r == r_value) * (s == 0)] for r_value in (0.25, 0.50)]
         })
         to_compare.append({
             "measure": name,
             "constant": "s = 1",
             "var": "r",
-            "data": [score[(r == r_value) * (s == 1)] for r_value in (0.25, 0.50)]
+            "data": [sc[(r == r_value) * (s == 1)] for r_value in (0.25, 0.50)]
         })
         to_compare.append({
             "measure": name,
             "constant": "r = 0.25",
             "var": "s",
-            "data": [score[(r == 0.25) * (s == s_value)] for s_value in (0, 1)]
+            "data": [sc[(r == 0.25) * (s == s_value)] for s_value in (0, 1)]
         })
         to_compare.append({
             "measure": name,
             "constant": "r = 0.50",
             "var": "s",
-            "data": [score[(r == 0.50) * (s == s_value)] for s_value in (0, 1)]
+            "data": [sc[(r == 0.50) * (s == s_value)] for s_value in (0, 1)]
         })
 
     ps = []
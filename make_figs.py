@@ -12,6 +12,7 @@ import behavior.fig
 import behavior.data
 
 import simulation.data
+import simulation.executor
 # from fit.compute import BackupFit  # Needed by pickle
 
 import analysis.simulation
@@ -77,10 +78,10 @@ def xp_fig():
     plt.show()
 
 
-def simulation_fig():
+def simulation_fig(exe=None):
 
-    pool_bkp = simulation.data.pool()
-    batch_bkp = simulation.data.batch()
+    pool_bkp = simulation.data.pool(exe=exe)
+    batch_bkp = simulation.data.batch(exe=exe)
 
     heuristics = simulation.data.get_heutistics()
 
@@ -125,10 +126,10 @@ def simulation_fig():
     plt.show()
 
 
-def dynamics_fig():
+def dynamics_fig(exe=None):
 
     xp_examples = fit.exemplary_cases.get()
-    sim_examples = simulation.data.individual()
+    sim_examples = simulation.data.individual(exe=exe)
 
     fig = plt.figure(figsize=(10, 8), dpi=200)
     gs = matplotlib.gridspec.GridSpec(
@@ -243,8 +244,12 @@ def dynamics_fig():
 def main():
 
     os.makedirs('fig', exist_ok=True)
-    dynamics_fig()
-    simulation_fig()
+
+    # Same worker processes for all the simulations
+    with simulation.executor.Executor() as exe:
+        dynamics_fig(exe=exe)
+        simulation_fig(exe=exe)
+
     xp_fig()
 
 
@@ -0,0 +1,206 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Adaptive sampling of 'r': after a coarse pass over bins of 'r', further runs are allocated, round after round,
+to the bins where the mean distance, price and profit over the last time steps (as in 'analysis.simulation')
+are the most uncertain or change the most steeply.
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+
+import simulation.data as data
+import simulation.parameters as parameters
+import simulation.summary as summary
+
+
+def metrics(pool_backup, span):
+
+    """
+    Mean distance, price and profit over the last time steps of each run (as in 'summary.Summary')
+    :param pool_backup: Backup of the pool (arbitrary Python object)
+    :param span: Number of time steps from the end of the simulation (int)
+    :return: Metrics (np.array of dimension n_runs, n_metrics)
+    """
+
+    n_positions = pool_backup.parameters["n_positions"]
+
+    values = np.zeros((pool_backup.n_runs, len(summary.Summary.variables)))
+
+    for chunk in pool_backup.chunks():
+
+        values[chunk, 0] = pool_backup.mean("distance", span=span, runs=chunk) / n_positions
+        values[chunk, 1] = pool_backup.mean("prices", span=span, runs=chunk)
+        values[chunk, 2] = pool_backup.mean("profits", span=span, runs=chunk)
+
+    return values
+
+
+def bin_statistics(r, values, boundaries):
+
+    """
+    Number of runs, mean and variance of the metrics of the runs of each bin of 'r'
+    :param r: 'r' of each run (np.array)
+    :param values: Metrics of each run (np.array of dimension n_runs, n_metrics; see 'metrics')
+    :param boundaries: Boundaries of the bins (np.array)
+    :return: Number of runs (np.array of length n_bins), mean and variance (np.array of dimension n_bins, n_metrics)
+    """
+
+    n_bins = len(boundaries) - 1
+
+    # Bin of a run: first one whose upper boundary is superior or equal to 'r'
+    bins = np.minimum(np.searchsorted(boundaries[1:], r), n_bins - 1)
+
+    n = np.bincount(bins, minlength=n_bins)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+
+        mean = np.column_stack([np.bincount(bins, weights=v, minlength=n_bins) for v in values.T]) / n[:, None]
+
+        var = np.column_stack([
+            np.bincount(bins, weights=(v - mean[bins, j]) ** 2, minlength=n_bins) for j, v in enumerate(values.T)
+        ]) / (n[:, None] - 1)
+
+    return n, mean, var
+
+
+def allocate(n, mean, var, n_new, gradient_weight=1.):
+
+    """
+    Share new runs between the bins, proportionally to the standard error of the mean of the metrics in each bin
+    plus the change of these means with the neighbouring bins (both relative to the range of each metric)
+    :param n: Number of runs of each bin (np.array)
+    :param mean: Mean of each metric in each bin (np.array of dimension n_bins, n_metrics)
+    :param var: Variance of each metric in each bin (np.array of dimension n_bins, n_metrics)
+    :param n_new: Number of runs to share (int)
+    :param gradient_weight: Weight of the changes of the means relatively to their uncertainty (float)
+    :return: Number of new runs for each bin (np.array)
+    """
+
+    scale = np.nanmax(mean, axis=0) - np.nanmin(mean, axis=0)
+    scale[~(scale > 0)] = 1
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        uncertainty = np.sqrt(var / n[:, None]) / scale
+
+    # Largest change of the means with one of the neighbouring bins
+    change = np.absolute(np.diff(mean, axis=0)) / scale
+    zeros = np.zeros((1, mean.shape[1]))
+    gradient = np.fmax(np.vstack((zeros, change)), np.vstack((change, zeros)))
+
+    score = np.nanmax(np.nan_to_num(uncertainty, nan=0) + gradient_weight * np.nan_to_num(gradient, nan=0), axis=1)
+
+    # Bins without enough runs for estimating their variance come first
+    score[n < 2] = np.inf
+
+    if np.any(np.isinf(score)):
+        score = np.isinf(score).astype(float)
+
+    if not np.any(score > 0):
+        score = np.ones(len(n))
+
+    # Largest remainder method
+    quotas = n_new * score / np.sum(score)
+    counts = np.floor(quotas).astype(int)
+    counts[np.argsort(counts - quotas)[:n_new - np.sum(counts)]] += 1
+
+    return counts
+
+
+def produce_data(spec, parameters_file, data_file, budget, n_bins=50, n_rounds=4, coarse_fraction=0.25,
+                 gradient_weight=1., span_ratio=0.33, **kwargs):
+
+    """
+    Produce a pool whose 'r' are sampled adaptively: a coarse pass draws the same number of runs in each bin of 'r',
+    then each round shares its runs between the bins (see 'allocate'). Only the new runs of a round are produced
+    (in a temporary directory); the pool, with the 'r' of each run, is saved once all the rounds are done,
+    as any other one (the runs of the rounds not being computed again, thanks to the cache).
+    :param spec: Specification of the pool, with random 'r' (see 'parameters.Sweep'); its settings are used (dictionary)
+    :param parameters_file: Path to the future parameters file (string)
+    :param data_file: Path to the future data directory (string)
+    :param budget: Total number of runs, at least two by bin (int)
+    :param n_bins: Number of bins of 'r' (int)
+    :param n_rounds: Number of rounds, including the coarse pass (int)
+    :param coarse_fraction: Part of the budget used by the coarse pass (float)
+    :param gradient_weight: See 'allocate' (float)
+    :param span_ratio: Part of the time steps, from the end of the simulation, on which the metrics are computed
+    :param kwargs: Additional arguments of 'data.produce_data' (e.g. 'use_lockstep' or 'exe')
+    :return: a 'pool backup' (arbitrary Python object)
+    """
+
+    assert budget >= 2 * n_bins, "The budget has to give at least two runs to each bin (for estimating their variance)."
+
+    # Settings as single values (see 'parameters.single_pool')
+    pool = parameters.single_pool(dict(spec, repeat=spec.get("repeat", 1)))
+    settings = {name: pool[name] for name in parameters.Sweep.settings}
+
+    boundaries = np.linspace(*spec["r"]["uniform"], n_bins + 1)
+    span = int(span_ratio * spec["t_max"])
+
+    counts = np.full(n_bins, min(max(2, int(coarse_fraction * budget) // n_bins), budget // n_bins))
+
+    rounds_directory = "{}.rounds".format(data_file)
+
+    r = []
+    values = np.zeros((0, len(summary.Summary.variables)))
+
+    def write_parameters(file_name, r_values, first_seed):
+
+        # The seed of a run is its index in the pool, hence the runs of a round are the same in the pool
+        j_param = dict(settings, r=r_values, seed={
+            "entropy": spec["seed"]["entropy"], "spawn_range": [first_seed, first_seed + len(r_values)]})
+
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+
+        with open(file_name, "w") as f:
+            json.dump(j_param, f, indent=2)
+
+    for i in range(n_rounds):
+
+        # 'r' of the new runs: uniformly in their bin
+        rng = np.random.default_rng(np.random.SeedSequence(spec["r"]["entropy"], spawn_key=(i, )))
+        new_r = rng.uniform(np.repeat(boundaries[:-1], counts), np.repeat(boundaries[1:], counts)).tolist()
+
+        first_seed = len(r)
+        r += new_r
+
+        # The runs of the last round are only produced with the pool
+        if i == n_rounds - 1 or len(r) >= budget:
+            break
+
+        round_parameters_file = os.path.join(rounds_directory, "{}.json".format(i))
+        write_parameters(round_parameters_file, new_r, first_seed)
+
+        round_backup = data.produce_data(round_parameters_file, os.path.join(rounds_directory, str(i)), **kwargs)
+
+        values = np.vstack((values, metrics(round_backup, span)))
+        del round_backup
+
+        n, mean, var = bin_statistics(np.array(r), values, boundaries)
+
+        counts = allocate(
+            n, mean, var, n_new=(budget - len(r)) // (n_rounds - 1 - i), gradient_weight=gradient_weight)
+
+    write_parameters(parameters_file, r, 0)
+
+    # Runs of the previous rounds are in the cache (even if they were forced)
+    pool_backup = data.produce_data(parameters_file, data_file, **dict(kwargs, force=False))
+
+    shutil.rmtree(rounds_directory, ignore_errors=True)
+
+    return pool_backup
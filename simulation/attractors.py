@@ -0,0 +1,235 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import math
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+import simulation.markov as markov
+
+
+class Attractor:
+
+    """
+    Closed set of moves in which the dynamics stay once entered.
+    As the move of the active firm only depends on the move of the passive firm, a pair of moves (move0, move1)
+    leads to the pairs formed by the move of the last firm to play and its best responses:
+    the attractors of the graph of the pairs are the ones of the graph of the best responses,
+    whose nodes are the moves of the last firm to play.
+    """
+
+    def __init__(self, moves, period, deterministic, probability, distance, price, profit):
+
+        self.moves = moves  # Moves belonging to the attractor
+        self.period = period  # Period of the Markov chain restricted to the attractor
+        self.deterministic = deterministic  # No tie: each move has a single best response
+        self.probability = probability  # Probability to end up in it, starting from a random move
+
+        # Long-run means (time averages)
+        self.distance = distance
+        self.price = price
+        self.profit = profit
+
+    @property
+    def fixed_point(self):
+
+        """
+        Both firms keep the same moves (their moves are best responses to each other).
+        """
+
+        return self.deterministic and len(self.moves) <= 2
+
+    @property
+    def limit_cycle(self):
+
+        return self.deterministic and len(self.moves) > 2
+
+    @property
+    def stochastic(self):
+
+        """
+        Some moves have several best responses (ties), chosen at random.
+        """
+
+        return not self.deterministic
+
+
+def _period(transitions, moves):
+
+    """
+    Compute the period of the Markov chain restricted to a closed strongly connected component
+    :param transitions: Transition matrix (scipy.sparse.csr_matrix)
+    :param moves: Moves of the component (np.array)
+    :return: Period (int)
+    """
+
+    level = {moves[0]: 0}
+    to_visit = [moves[0]]
+
+    period = 0
+
+    while to_visit:
+
+        i = to_visit.pop(0)
+
+        for j in transitions.indices[transitions.indptr[i]:transitions.indptr[i+1]]:
+
+            if j not in level:
+                level[j] = level[i] + 1
+                to_visit.append(j)
+
+            else:
+                period = math.gcd(period, level[i] + 1 - level[j])
+
+    return period
+
+
+def _stationary_distribution(transitions):
+
+    """
+    Compute the stationary distribution of an irreducible Markov chain
+    :param transitions: Transition matrix (np.array)
+    :return: Stationary distribution (np.array)
+    """
+
+    n = len(transitions)
+
+    a = np.vstack((transitions.T - np.eye(n), np.ones(n)))
+    b = np.zeros(n + 1)
+    b[-1] = 1
+
+    return np.linalg.lstsq(a, b, rcond=None)[0]
+
+
+def analyse(param):
+
+    """
+    Find the attractors of the dynamics of an economy.
+    :param param: Parameters of the economy (arbitrary Python object)
+    :return: Attractors (list)
+    """
+
+    m = markov.MarkovModel(param)
+
+    transitions = m.transitions
+    n_strategies = m.n_strategies
+
+    n_components, labels = scipy.sparse.csgraph.connected_components(
+        transitions, directed=True, connection="strong")
+
+    # A component is closed if no transition leaves it
+    edges = transitions.tocoo()
+    leaving = labels[edges.row] != labels[edges.col]
+
+    closed = np.ones(n_components, dtype=bool)
+    closed[labels[edges.row[leaving]]] = False
+
+    idx_closed = np.flatnonzero(closed)
+
+    # Probability to end up in each closed component, starting from a random move for firm 1
+    # (as in 'Model.run'); a move of a closed component is absorbed in its component
+    absorption = np.zeros((n_strategies, len(idx_closed)))
+
+    in_closed = closed[labels]
+    absorption[in_closed, np.searchsorted(idx_closed, labels[in_closed])] = 1
+
+    transient = np.flatnonzero(~in_closed)
+
+    if len(transient):
+
+        q = transitions[transient][:, transient]
+        r = transitions[transient] @ absorption
+
+        absorption[transient] = scipy.sparse.linalg.spsolve(
+            scipy.sparse.identity(len(transient), format="csc") - q.tocsc(), r).reshape(len(transient), -1)
+
+    probabilities = np.mean(absorption, axis=0)
+
+    attractors = []
+
+    for i, label in enumerate(idx_closed):
+
+        moves = np.flatnonzero(labels == label)
+
+        sub_transitions = transitions[moves][:, moves].toarray()
+        stationary = _stationary_distribution(sub_transitions)
+
+        attractors.append(
+            Attractor(
+                moves=moves,
+                period=_period(transitions, moves),
+                deterministic=np.all(np.diff(transitions.indptr)[moves] == 1),
+                probability=probabilities[i],
+                distance=stationary @ m.expected_distance[moves],
+                price=np.mean(stationary @ m.expected_prices[moves]),
+                profit=np.mean(stationary @ m.expected_profits[moves])
+            )
+        )
+
+    return attractors
+
+
+def analyse_over_effective_radii(param):
+
+    """
+    Find the attractors for every effective radius of the grid
+    :param param: Parameters giving the settings of the grid and the heuristic (arbitrary Python object)
+    :return: Attractors for each effective radius (list of lists)
+    """
+
+    attractors = []
+
+    for effective_radius in range(param.n_positions):
+
+        p = copy.copy(param)
+        p.r = (effective_radius + 0.5) / param.n_positions
+        p.check()
+
+        attractors.append(analyse(p))
+
+    return attractors
+
+
+def report(param):
+
+    """
+    Summarize the long-run behavior for every effective radius of the grid
+    :param param: Parameters giving the settings of the grid and the heuristic (arbitrary Python object)
+    :return: For each effective radius, number of attractors of each kind
+        (fixed points, limit cycles and stochastic ones, which add up to the number of attractors)
+        and long-run means weighted by the probability of each attractor (list of dictionaries)
+    """
+
+    summaries = []
+
+    for effective_radius, attractors in enumerate(analyse_over_effective_radii(param)):
+
+        probabilities = np.array([a.probability for a in attractors])
+
+        summaries.append({
+            "effective_radius": effective_radius,
+            "n_attractors": len(attractors),
+            "n_fixed_points": int(sum(a.fixed_point for a in attractors)),
+            "n_limit_cycles": int(sum(a.limit_cycle for a in attractors)),
+            "n_stochastic": int(sum(a.stochastic for a in attractors)),
+            "distance": float(probabilities @ [a.distance / param.n_positions for a in attractors]),
+            "price": float(probabilities @ [a.price for a in attractors]),
+            "profit": float(probabilities @ [a.profit for a in attractors])
+        })
+
+    return summaries
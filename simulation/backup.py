@@ -13,9 +13,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import functools
 import pickle
 import json
 import os
+import shutil
+import numpy as np
+
+import simulation.segments as segments
 
 
 class Backup:
@@ -52,7 +57,7 @@ class Backup:
 
 class RunBackup(Backup):
 
-    def __init__(self, parameters, positions, prices, profits, n_consumers):
+    def __init__(self, parameters, positions, prices, profits, n_consumers, t_convergence=None, period=None):
         super().__init__(parameters)
 
         self.positions = positions
@@ -60,10 +65,903 @@ class RunBackup(Backup):
         self.profits = profits
         self.n_consumers = n_consumers
 
+        # Time step from which the run is caught in a deterministic cycle, and its period (None if never)
+        self.t_convergence = t_convergence
+        self.period = period
+
+
+def int_dtype(max_value):
+
+    """
+    Smallest signed integer type able to store the values from 0 to 'max_value' (and -1)
+    :param max_value: Maximum value (int)
+    :return: Data type (np.dtype)
+    """
+
+    for dtype in np.int8, np.int16, np.int32:
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+
+    return np.dtype(np.int64)
+
+
+def compact_dtypes(n_positions, n_prices):
+
+    """
+    Data types of the compact encoding of the trajectories
+    :return: Data type of each field (dictionary)
+    """
+
+    return {
+        "positions": int_dtype(n_positions - 1),
+        "price_indices": int_dtype(n_prices - 1),
+        "half_n_consumers": int_dtype(2 * n_positions)
+    }
+
+
+def price_grid(parameters):
+
+    """
+    :param parameters: Parameters of a run (arbitrary Python object) or of a pool (dictionary)
+    :return: Prices that the firms can choose (np.array)
+    """
+
+    if type(parameters) == dict:
+        return np.linspace(parameters["p_min"], parameters["p_max"], parameters["n_prices"])
+
+    return np.linspace(parameters.p_min, parameters.p_max, parameters.n_prices)
+
+
+def _decode_prices(price_indices, prices):
+    return prices[price_indices]
+
+
+def _decode_n_consumers(half_n_consumers):
+    return half_n_consumers / 2
+
+
+def _decode_profits(price_indices, half_n_consumers, prices):
+    # Same operations as for the tables of the model, hence the same values
+    return (half_n_consumers / 2) * prices[price_indices]
+
+
+class CompactRunBackup(Backup):
+
+    """
+    Backup of a run storing small integers (about 8 times less memory than with 'RunBackup'):
+    positions, indices of the prices, and twice the numbers of consumers (which are multiples of 0.5).
+    Prices, numbers of consumers and profits are derived on demand, as float arrays (as in 'RunBackup').
+    The arrays can have additional first dimensions (e.g. for several runs).
+    """
+
+    fields = "positions", "price_indices", "half_n_consumers"
+
+    def __init__(self, parameters, positions, price_indices, half_n_consumers, prices_grid,
+                 t_convergence=None, period=None):
+        super().__init__(parameters)
+
+        self.positions = positions
+        self.price_indices = price_indices
+        self.half_n_consumers = half_n_consumers
+
+        # Prices that the firms can choose
+        self.prices_grid = prices_grid
+
+        # Time step from which the run is caught in a deterministic cycle, and its period (None if never)
+        self.t_convergence = t_convergence
+        self.period = period
+
+    @classmethod
+    def encode(cls, run_backup):
+
+        """
+        :param run_backup: Backup of a run, compact or not (arbitrary Python object)
+        :return: Compact backup of the run (arbitrary Python object)
+        """
+
+        if isinstance(run_backup, cls):
+            return run_backup
+
+        prices = price_grid(run_backup.parameters)
+        dtypes = compact_dtypes(run_backup.parameters.n_positions, run_backup.parameters.n_prices)
+
+        return cls(
+            parameters=run_backup.parameters,
+            positions=np.asarray(run_backup.positions).astype(dtypes["positions"]),
+            price_indices=np.searchsorted(prices, run_backup.prices).astype(dtypes["price_indices"]),
+            half_n_consumers=np.rint(2 * np.asarray(run_backup.n_consumers)).astype(dtypes["half_n_consumers"]),
+            prices_grid=prices, t_convergence=run_backup.t_convergence, period=run_backup.period)
+
+    @property
+    def prices(self):
+        return _decode_prices(self.price_indices, self.prices_grid)
+
+    @property
+    def n_consumers(self):
+        return _decode_n_consumers(self.half_n_consumers)
+
+    @functools.cached_property
+    def profits(self):
+        return _decode_profits(self.price_indices, self.half_n_consumers, self.prices_grid)
+
+    def dense(self):
+
+        """
+        :return: Backup of the run with float arrays (arbitrary Python object)
+        """
+
+        return RunBackup(
+            parameters=self.parameters, positions=self.positions.astype(int), prices=self.prices,
+            profits=self.profits, n_consumers=self.n_consumers,
+            t_convergence=self.t_convergence, period=self.period)
+
+
+def compressed_dtypes(n_positions, n_prices, t_max):
+
+    """
+    Data types of the run-length encoding of the trajectories
+    :return: Data type of each field (dictionary)
+    """
+
+    dtypes = compact_dtypes(n_positions, n_prices)
+
+    return {
+        "starts": int_dtype(t_max),
+        "segment_positions": dtypes["positions"],
+        "segment_price_indices": dtypes["price_indices"],
+        "segment_half_n_consumers": dtypes["half_n_consumers"]
+    }
+
+
+def _segment_values(variable, segment_positions, segment_price_indices, segment_half_n_consumers, prices_grid):
+
+    """
+    Value of a variable for each segment, averaged over the two firms
+    :param variable: "distance" (between the two firms), "positions", "prices", "n_consumers" or "profits" (string)
+    :return: Values (np.array)
+    """
+
+    if variable == "distance":
+        return np.absolute(segment_positions[:, 0].astype(int) - segment_positions[:, 1])
+
+    values = {
+        "positions": lambda: segment_positions,
+        "prices": lambda: _decode_prices(segment_price_indices, prices_grid),
+        "n_consumers": lambda: _decode_n_consumers(segment_half_n_consumers),
+        "profits": lambda: _decode_profits(segment_price_indices, segment_half_n_consumers, prices_grid)
+    }[variable]()
+
+    return np.mean(values, axis=1)
+
+
+# Columns of several runs: offsets of the segments of each run (see 'simulation.segments'), segments of all the runs
+# one run after the other (see 'CompressedRunBackup'), and convergence of each run (-1 if never)
+run_columns = ("offsets", "starts", "segment_positions", "segment_price_indices", "segment_half_n_consumers",
+               "t_convergence", "period")
+
+
+def _convergence(value):
+    return -1 if value is None else value
+
+
+def concatenate_segments(backups):
+
+    """
+    Put the segments of several runs one run after the other
+    :param backups: Run-length encoded backup of each run (list)
+    :return: Columns of the runs (dictionary of np.array; see 'run_columns')
+    """
+
+    columns = {field: np.concatenate([getattr(b, field) for b in backups]) for field in CompressedRunBackup.fields}
+    columns["offsets"] = np.concatenate(([0], np.cumsum([len(b.starts) for b in backups]))).astype(int)
+
+    for column in "t_convergence", "period":
+        columns[column] = np.array([_convergence(getattr(b, column)) for b in backups], dtype=int)
+
+    return columns
+
+
+def encode_segments(positions, price_indices, half_n_consumers, t_convergence, period):
+
+    """
+    Run-length encode several runs at once (as 'CompressedRunBackup.encode'), one run after the other
+    :param positions: Positions of each run (np.array of dimension n_runs, t_max, 2, with the compact data type)
+    :param price_indices: Indices of the prices of each run (idem)
+    :param half_n_consumers: Twice the numbers of consumers of each run (idem)
+    :param t_convergence: Time step from which each run is caught in a deterministic cycle (np.array; -1 if never)
+    :param period: Period of this cycle (np.array; -1 if none)
+    :return: Columns of the runs (dictionary of np.array; see 'run_columns')
+    """
+
+    t_max = positions.shape[1]
+    arrays = positions, price_indices, half_n_consumers
+
+    runs, starts, offsets = segments.find_starts_of_runs(np.where(t_convergence >= 0, t_convergence, t_max), *arrays)
+
+    columns = {"offsets": offsets, "starts": starts.astype(int_dtype(t_max))}
+
+    for field, a in zip(CompressedRunBackup.fields[1:], arrays):
+        columns[field] = a[runs, starts]
+
+    columns["t_convergence"] = np.asarray(t_convergence, dtype=int)
+    columns["period"] = np.asarray(period, dtype=int)
+
+    return columns
+
+
+def concatenate_columns(parts):
+
+    """
+    Put the runs of several columns one after the other
+    :param parts: Columns of runs (list of dictionaries of np.array; see 'run_columns')
+    :return: Columns of all the runs (dictionary of np.array)
+    """
+
+    columns = {column: np.concatenate([part[column] for part in parts]) for column in run_columns[1:]}
+
+    shifts = np.cumsum([0] + [part["offsets"][-1] for part in parts])
+    columns["offsets"] = np.concatenate([[0]] + [part["offsets"][1:] + shift for part, shift in zip(parts, shifts)])
+
+    return columns
+
+
+def take_runs(columns, runs):
+
+    """
+    Select some runs of columns (possibly memory-mapped: only the parts of the selected runs are read)
+    :param columns: Columns of runs (dictionary of np.array; see 'run_columns')
+    :param runs: Indices of the runs (np.array)
+    :return: Columns of the selected runs, in the given order (dictionary of np.array)
+    """
+
+    first = np.asarray(columns["offsets"][runs])
+    indices, offsets = segments.ranges(first, np.asarray(columns["offsets"][runs + 1]) - first)
+
+    selected = {field: _take(columns[field], indices) for field in CompressedRunBackup.fields}
+    selected["offsets"] = offsets
+
+    for column in "t_convergence", "period":
+        selected[column] = np.asarray(columns[column][runs])
+
+    return selected
+
+
+def merge_columns(parts):
+
+    """
+    Gather the runs of several columns
+    :param parts: Indices of the runs of each part among all the runs, and their columns (list of tuples)
+    :return: Columns of all the runs, in the order of their indices (dictionary of np.array)
+    """
+
+    indices = np.concatenate([i for i, _ in parts])
+
+    return take_runs(concatenate_columns([columns for _, columns in parts]), np.argsort(indices))
+
+
+def _segment_arguments(columns, t_max):
+
+    """
+    :param columns: Columns of runs (dictionary of np.array; see 'run_columns')
+    :param t_max: Number of time steps (int)
+    :return: Arguments of the functions of 'simulation.segments' for these runs (dictionary)
+    """
+
+    t_convergence = np.asarray(columns["t_convergence"])
+
+    return {
+        "starts": columns["starts"],
+        "offsets": columns["offsets"],
+        "t_stored": np.where(t_convergence >= 0, t_convergence, t_max),
+        "period": np.maximum(columns["period"], 0),
+        "t_max": t_max
+    }
+
+
+def reduce_segments(reducer, variable, columns, t_max, prices_grid, span=None):
+
+    """
+    Reduce over the last time steps a variable averaged over the two firms, for each run of columns,
+    in a time proportional to their number of segments
+    :param reducer: 'segments.means' or 'segments.stds'
+    :param variable: "distance", "positions", "prices", "n_consumers" or "profits" (string)
+    :param columns: Columns of runs (dictionary of np.array; see 'run_columns')
+    :param t_max: Number of time steps (int)
+    :param prices_grid: Prices that the firms can choose (np.array)
+    :param span: Number of time steps from the end of the simulation (int; None for all of them)
+    :return: Value for each run (np.array)
+    """
+
+    values = _segment_values(
+        variable, prices_grid=prices_grid, **{field: columns[field] for field in CompressedRunBackup.fields[1:]})
+
+    first = 0 if span is None else t_max - span
+
+    return reducer(values, first=first, **_segment_arguments(columns, t_max))
+
+
+def split_segments(columns, parameters_list, t_max, prices_grid):
+
+    """
+    Get the backup of each run of columns
+    :param columns: Columns of the runs (dictionary of np.array; see 'run_columns')
+    :param parameters_list: Parameters of each run (iterable)
+    :param t_max: Number of time steps (int)
+    :param prices_grid: Prices that the firms can choose (np.array)
+    :return: Run-length encoded backup of each run, whose segments are views on the columns (list)
+    """
+
+    offsets = columns["offsets"]
+
+    return [
+        CompressedRunBackup(
+            parameters=param,
+            **{field: columns[field][offsets[i]:offsets[i + 1]] for field in CompressedRunBackup.fields},
+            t_max=t_max, prices_grid=prices_grid,
+            t_convergence=None if columns["t_convergence"][i] < 0 else int(columns["t_convergence"][i]),
+            period=None if columns["period"][i] < 0 else int(columns["period"][i]))
+        for i, param in enumerate(parameters_list)
+    ]
+
+
+class CompressedRunBackup(Backup):
+
+    """
+    Backup of a run storing its trajectory as segments of constant moves (see 'simulation.segments'),
+    only until it is caught in a deterministic cycle: its size depends on the number of changes of behavior,
+    not on 't_max'. Dense arrays (as in 'RunBackup') are decoded on demand, and means over the last time steps
+    are computed directly from the segments.
+    """
+
+    fields = "starts", "segment_positions", "segment_price_indices", "segment_half_n_consumers"
+
+    def __init__(self, parameters, starts, segment_positions, segment_price_indices, segment_half_n_consumers,
+                 t_max, prices_grid, t_convergence=None, period=None):
+        super().__init__(parameters)
+
+        # Time step at which each segment starts, and moves during each segment (arrays of dimension n_segments, 2)
+        self.starts = starts
+        self.segment_positions = segment_positions
+        self.segment_price_indices = segment_price_indices
+        self.segment_half_n_consumers = segment_half_n_consumers
+
+        self.t_max = t_max
+
+        # Prices that the firms can choose
+        self.prices_grid = prices_grid
+
+        # Time step from which the run is caught in a deterministic cycle, and its period (None if never)
+        self.t_convergence = t_convergence
+        self.period = period
+
+    @classmethod
+    def encode(cls, run_backup):
+
+        """
+        :param run_backup: Backup of a run, encoded or not (arbitrary Python object)
+        :return: Run-length encoded backup of the run (arbitrary Python object)
+        """
+
+        if isinstance(run_backup, cls):
+            return run_backup
+
+        run_backup = CompactRunBackup.encode(run_backup)
+
+        t_max = len(run_backup.positions)
+        t_stored = t_max if run_backup.t_convergence is None else run_backup.t_convergence
+
+        arrays = [getattr(run_backup, field)[:t_stored] for field in CompactRunBackup.fields]
+        starts = segments.find_starts(*arrays)
+
+        return cls(
+            run_backup.parameters, starts.astype(int_dtype(t_max)), *(a[starts] for a in arrays),
+            t_max=t_max, prices_grid=run_backup.prices_grid,
+            t_convergence=run_backup.t_convergence, period=run_backup.period)
+
+    def _segments(self):
+
+        return {
+            "starts": self.starts,
+            "offsets": np.array([0, len(self.starts)]),
+            "t_stored": np.array([self.t_max if self.t_convergence is None else self.t_convergence]),
+            "period": np.array([self.period or 0]),
+            "t_max": self.t_max
+        }
+
+    @functools.cached_property
+    def positions(self):
+        return segments.decode(self.segment_positions, **self._segments())[0]
+
+    @functools.cached_property
+    def price_indices(self):
+        return segments.decode(self.segment_price_indices, **self._segments())[0]
+
+    @functools.cached_property
+    def half_n_consumers(self):
+        return segments.decode(self.segment_half_n_consumers, **self._segments())[0]
+
+    @property
+    def prices(self):
+        return _decode_prices(self.price_indices, self.prices_grid)
+
+    @property
+    def n_consumers(self):
+        return _decode_n_consumers(self.half_n_consumers)
+
+    @functools.cached_property
+    def profits(self):
+        return _decode_profits(self.price_indices, self.half_n_consumers, self.prices_grid)
+
+    def compact(self):
+
+        """
+        :return: Backup of the run with dense arrays of small integers (arbitrary Python object)
+        """
+
+        return CompactRunBackup(
+            parameters=self.parameters, positions=self.positions, price_indices=self.price_indices,
+            half_n_consumers=self.half_n_consumers, prices_grid=self.prices_grid,
+            t_convergence=self.t_convergence, period=self.period)
+
+    def dense(self):
+
+        """
+        :return: Backup of the run with float arrays (arbitrary Python object)
+        """
+
+        return self.compact().dense()
+
+    def _reduce(self, reducer, variable, span):
+
+        values = _segment_values(
+            variable, self.segment_positions, self.segment_price_indices, self.segment_half_n_consumers,
+            self.prices_grid)
+
+        first = 0 if span is None else self.t_max - span
+
+        return float(reducer(values, first=first, **self._segments())[0])
+
+    def mean(self, variable, span=None):
+
+        """
+        Mean of a variable over the last time steps, averaged over the two firms
+        :param variable: "distance", "positions", "prices", "n_consumers" or "profits" (string)
+        :param span: Number of time steps from the end of the simulation (int; None for all of them)
+        :return: Mean (float)
+        """
+
+        return self._reduce(segments.means, variable, span)
+
+    def std(self, variable, span=None):
+
+        """
+        Standard deviation over time of a variable averaged over the two firms (see 'mean')
+        :return: Standard deviation (float)
+        """
+
+        return self._reduce(segments.stds, variable, span)
+
+
+class DerivedColumn:
+
+    """
+    Column computed from other columns on demand, only for the elements requested by indexing:
+    slicing a derived column of memory-mapped columns only reads the corresponding parts of the files.
+    """
+
+    def __init__(self, func, columns, **kwargs):
+
+        """
+        :param func: Function computing the elements from the ones of the columns
+        :param columns: Columns from which the elements are computed (list of np.array)
+        :param kwargs: Additional arguments of the function
+        """
+
+        self.func = functools.partial(func, **kwargs)
+        self.columns = columns
+
+    def __getitem__(self, key):
+        return self.func(*(column[key] for column in self.columns))
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    @property
+    def shape(self):
+        return self.columns[0].shape
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[...], dtype=dtype)
+
+
+class TrajectoryColumn:
+
+    """
+    Dense column of dimension n_runs, t_max, 2 of a pool backup, decoded from the segments of the requested runs only.
+    """
+
+    def __init__(self, pool_backup, field):
+
+        """
+        :param pool_backup: Backup of the pool (arbitrary Python object)
+        :param field: "positions", "price_indices" or "half_n_consumers" (string)
+        """
+
+        self.pool_backup = pool_backup
+        self.field = field
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key, )
+
+        if not key or key[0] is Ellipsis:
+            key = (slice(None), ) + key
+
+        runs = np.arange(self.pool_backup.n_runs)[key[0]]
+
+        values = self.pool_backup.decode(self.field, np.atleast_1d(runs))
+
+        if np.ndim(runs) == 0:
+            return values[0][key[1:]]
+
+        return values[(slice(None), ) + key[1:]]
+
+    def __len__(self):
+        return self.pool_backup.n_runs
+
+    @property
+    def shape(self):
+        return self.pool_backup.n_runs, self.pool_backup.t_max, 2
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[...], dtype=dtype)
+
+
+def _take(column, indices):
+
+    """
+    Read some elements of a (possibly memory-mapped) column, as a slice if they are consecutive
+    """
+
+    if len(indices) and indices[-1] - indices[0] + 1 == len(indices):
+        return column[indices[0]:indices[-1] + 1]
+
+    return column[indices]
+
 
 class PoolBackup(Backup):
 
-    def __init__(self, parameters, backups):
+    """
+    Backup of several runs, stored by columns: the segments of all the runs, one run after the other
+    (as in 'CompressedRunBackup'; 'offsets' giving the first segment of each run), one array for the convergence
+    of each run, and one array for each parameter varying between runs ('r', 'seed' and 'move').
+    Dense columns of dimension n_runs, t_max, 2 (positions, prices, numbers of consumers and profits) are decoded
+    for the requested runs only, and means over the last time steps are computed directly from the segments.
+    Saved as one '.npy' file per column, that can be memory-mapped when loading.
+    """
+
+    fields = run_columns
+    parameter_columns = "r", "seed", "move"
+
+    def __init__(self, parameters, offsets, starts, segment_positions, segment_price_indices, segment_half_n_consumers,
+                 t_convergence, period, r, seed, move):
         super().__init__(parameters)
 
-        self.backups = backups
+        # Array of length n_runs + 1
+        self.offsets = offsets
+
+        # Arrays of dimension n_segments (, 2)
+        self.starts = starts
+        self.segment_positions = segment_positions
+        self.segment_price_indices = segment_price_indices
+        self.segment_half_n_consumers = segment_half_n_consumers
+
+        # Arrays of length n_runs (-1 if never caught in a deterministic cycle)
+        self.t_convergence = t_convergence
+        self.period = period
+
+        # Parameters of each run
+        self.r = r
+        self.seed = seed
+        self.move = move
+
+        self.t_max = parameters["t_max"]
+        self.prices_grid = price_grid(parameters)
+
+        # Columns of dimension n_runs, t_max, 2
+        self.positions = TrajectoryColumn(self, "positions")
+        self.price_indices = TrajectoryColumn(self, "price_indices")
+        self.half_n_consumers = TrajectoryColumn(self, "half_n_consumers")
+
+        self.prices = DerivedColumn(_decode_prices, [self.price_indices], prices=self.prices_grid)
+        self.n_consumers = DerivedColumn(_decode_n_consumers, [self.half_n_consumers])
+        self.profits = DerivedColumn(
+            _decode_profits, [self.price_indices, self.half_n_consumers], prices=self.prices_grid)
+
+    @property
+    def n_runs(self):
+        return len(self.r)
+
+    def chunks(self, chunk_size=10000):
+
+        """
+        Split the runs in consecutive chunks, for reading the columns piece by piece
+        :param chunk_size: Maximum number of runs by chunk (int)
+        :return: Iterator over the chunks (slices)
+        """
+
+        for start in range(0, self.n_runs, chunk_size):
+            yield slice(start, min(start + chunk_size, self.n_runs))
+
+    def _columns(self, runs):
+
+        """
+        Read the columns of some runs
+        :param runs: Indices of the runs (np.array)
+        :return: Columns of the runs (dictionary of np.array; see 'run_columns')
+        """
+
+        return take_runs({column: getattr(self, column) for column in run_columns}, runs)
+
+    def decode(self, field, runs):
+
+        """
+        :param field: "positions", "price_indices" or "half_n_consumers" (string)
+        :param runs: Indices of the runs (np.array)
+        :return: Dense array of dimension len(runs), t_max, 2
+        """
+
+        columns = self._columns(runs)
+        return segments.decode(columns["segment_{}".format(field)], **_segment_arguments(columns, self.t_max))
+
+    def _reduce(self, reducer, variable, span, runs):
+
+        runs = np.atleast_1d(np.arange(self.n_runs)[runs])
+
+        return reduce_segments(reducer, variable, self._columns(runs), self.t_max, self.prices_grid, span=span)
+
+    def mean(self, variable, span=None, runs=slice(None)):
+
+        """
+        Mean of a variable over the last time steps of each run, averaged over the two firms,
+        in a time proportional to the number of segments of the runs
+        :param variable: "distance", "positions", "prices", "n_consumers" or "profits" (string)
+        :param span: Number of time steps from the end of the simulation (int; None for all of them)
+        :param runs: Runs (anything that can index an array; default: all of them)
+        :return: Mean for each run (np.array)
+        """
+
+        return self._reduce(segments.means, variable, span, runs)
+
+    def std(self, variable, span=None, runs=slice(None)):
+
+        """
+        Standard deviation over time of a variable averaged over the two firms, for each run (see 'mean')
+        :return: Standard deviation for each run (np.array)
+        """
+
+        return self._reduce(segments.stds, variable, span, runs)
+
+    def run_backup(self, i):
+
+        """
+        Get the backup of a single run
+        :param i: Index of the run (int)
+        :return: Backup of the run (arbitrary Python object)
+        """
+
+        # Imported here, as 'simulation.parameters' depends (through 'simulation.model') on this module
+        import simulation.model
+        import simulation.parameters
+
+        seed_entropy = None if type(self.parameters["seed"]) == list else self.parameters["seed"]["entropy"]
+
+        param = simulation.parameters.Parameters(
+            p_min=self.parameters["p_min"],
+            p_max=self.parameters["p_max"],
+            n_prices=self.parameters["n_prices"],
+            n_positions=self.parameters["n_positions"],
+            t_max=self.parameters["t_max"],
+            r=float(self.r[i]),
+            seed=int(self.seed[i]),
+            seed_entropy=seed_entropy,
+            move=getattr(simulation.model.Move, str(self.move[i]))
+        )
+
+        return split_segments(self._columns(np.array([i])), [param], t_max=self.t_max, prices_grid=self.prices_grid)[0]
+
+    @property
+    def backups(self):
+
+        """
+        Backup of each run (list)
+        """
+
+        return [self.run_backup(i) for i in range(self.n_runs)]
+
+    def save(self, parameters_file, data_file):
+
+        """
+        :param parameters_file: Path to the parameters file (string)
+        :param data_file: Path to the directory of the columns (string)
+        """
+
+        os.makedirs(os.path.dirname(parameters_file), exist_ok=True)
+        os.makedirs(data_file, exist_ok=True)
+
+        for file_name in (parameters_file, os.path.join(data_file, "parameters.json")):
+            with open(file_name, "w") as f:
+                json.dump(self.parameters, f, indent=2)
+
+        # Files are replaced, not overwritten: memory maps of the former ones (e.g. of these columns) stay valid
+        for column in self.fields + self.parameter_columns:
+
+            file_name = os.path.join(data_file, "{}.npy".format(column))
+
+            with open("{}.tmp".format(file_name), "wb") as f:
+                np.save(f, getattr(self, column))
+
+            os.replace("{}.tmp".format(file_name), file_name)
+
+    @classmethod
+    def load(cls, data_file, mmap_mode="r"):
+
+        """
+        :param data_file: Path to the directory of the columns (string)
+        :param mmap_mode: Memory-map the columns with this mode, only reading from disk what is accessed
+            (see 'np.load'; None for loading them entirely in memory)
+        :return: Backup of the pool (arbitrary Python object)
+        """
+
+        with open(os.path.join(data_file, "parameters.json"), "r") as f:
+            parameters = json.load(f)
+
+        columns = {
+            column: np.load(os.path.join(data_file, "{}.npy".format(column)), mmap_mode=mmap_mode)
+            for column in cls.fields + cls.parameter_columns
+        }
+
+        return cls(parameters=parameters, **columns)
+
+
+class PoolBackupWriter:
+
+    """
+    Write the columns of a pool backup on disk chunk by chunk, the runs coming in their order, without keeping them
+    in memory. Segments are appended to temporary files as the runs come, and turned into columns when closing.
+    Everything is written in a temporary directory, whose files replace the ones of the pool when closing:
+    a pool backup loaded before (whose columns are memory-mapped) keeps its data.
+    """
+
+    def __init__(self, parameters, parameters_file, data_file, n_runs):
+
+        """
+        :param parameters: Parameters of the pool (dictionary)
+        :param parameters_file: Path to the parameters file (string)
+        :param data_file: Path to the directory of the columns (string)
+        :param n_runs: Number of runs (int)
+        """
+
+        os.makedirs(os.path.dirname(parameters_file), exist_ok=True)
+
+        self.data_file = data_file
+        self.tmp_directory = "{}.tmp".format(data_file)
+
+        # Left over by an interrupted production
+        if os.path.exists(self.tmp_directory):
+            shutil.rmtree(self.tmp_directory)
+
+        os.makedirs(self.tmp_directory)
+
+        for file_name in (parameters_file, os.path.join(self.tmp_directory, "parameters.json")):
+            with open(file_name, "w") as f:
+                json.dump(parameters, f, indent=2)
+
+        self.dtypes = compressed_dtypes(parameters["n_positions"], parameters["n_prices"], parameters["t_max"])
+        self.dtypes.update({
+            "offsets": np.dtype(int), "t_convergence": np.dtype(int), "period": np.dtype(int),
+            "r": np.dtype(float), "seed": np.dtype(int), "move": np.dtype("<U{}".format(len(parameters["move"])))
+        })
+
+        self.n_runs = n_runs
+        self.n_written = 0
+        self.n_segments = 0
+
+        self.segment_files = {
+            field: open(self._tmp_file(field), "wb") for field in CompressedRunBackup.fields}
+
+        # Columns of length n_runs (n_runs + 1 for the offsets) are written directly in their files, as the runs come
+        # (a memory map would keep the written pages in memory)
+        self.files = {"offsets": self._create("offsets", (n_runs + 1, ))}
+        self.files["offsets"].write(np.zeros(1, dtype=self.dtypes["offsets"]).tobytes())
+
+        for column in "t_convergence", "period", "r", "seed", "move":
+            self.files[column] = self._create(column, (n_runs, ))
+
+    def _file(self, column):
+        return os.path.join(self.tmp_directory, "{}.npy".format(column))
+
+    def _tmp_file(self, field):
+        return os.path.join(self.tmp_directory, "{}.tmp".format(field))
+
+    def _create(self, column, shape):
+
+        """
+        Create the file of a column with its header
+        :return: File opened for writing, at the beginning of the data (file object)
+        """
+
+        array = np.lib.format.open_memmap(self._file(column), mode="w+", dtype=self.dtypes[column], shape=shape)
+        offset = array.offset
+        del array
+
+        f = open(self._file(column), "r+b")
+        f.seek(offset)
+
+        return f
+
+    def write(self, table, columns):
+
+        """
+        Write the next runs
+        :param table: Parameters of the runs (parameter table)
+        :param columns: Columns of the runs (dictionary of np.array; see 'run_columns')
+        """
+
+        for field, f in self.segment_files.items():
+            f.write(np.asarray(columns[field], dtype=self.dtypes[field]).tobytes())
+
+        values = {
+            "offsets": self.n_segments + np.asarray(columns["offsets"][1:]),
+            "t_convergence": columns["t_convergence"],
+            "period": columns["period"],
+            "r": table.r,
+            "seed": table.seed,
+            "move": np.array([move.name for move in table.moves])[table.move]
+        }
+
+        for column, value in values.items():
+            self.files[column].write(np.asarray(value, dtype=self.dtypes[column]).tobytes())
+
+        self.n_written += len(table)
+        self.n_segments += int(columns["offsets"][-1])
+
+    def close(self):
+
+        """
+        Write the columns of the segments, and move all the files in the directory of the pool
+        """
+
+        assert self.n_written == self.n_runs, "Every run of the pool has to be written."
+
+        for f in list(self.files.values()) + list(self.segment_files.values()):
+            f.close()
+
+        self.files = {}
+        self.segment_files = {}
+
+        for field in CompressedRunBackup.fields:
+
+            row_shape = () if field == "starts" else (2, )
+
+            with self._create(field, (self.n_segments, ) + row_shape) as f, open(self._tmp_file(field), "rb") as tmp:
+                shutil.copyfileobj(tmp, f)
+
+            os.remove(self._tmp_file(field))
+
+        os.makedirs(self.data_file, exist_ok=True)
+
+        # Files are replaced, not overwritten: memory maps of the former ones stay valid
+        for file_name in os.listdir(self.tmp_directory):
+            os.replace(os.path.join(self.tmp_directory, file_name), os.path.join(self.data_file, file_name))
+
+        os.rmdir(self.tmp_directory)
+
+
+class ExpectedRunBackup(RunBackup):
+
+    def __init__(self, parameters, positions, prices, profits, n_consumers, distance):
+        super().__init__(parameters, positions=positions, prices=prices, profits=profits, n_consumers=n_consumers)
+
+        self.distance = distance
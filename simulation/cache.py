@@ -0,0 +1,233 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+
+import simulation.backup as backup
+import simulation.lockstep as lockstep
+import simulation.model as model
+import simulation.parameters as parameters
+import simulation.segments as segments
+
+
+# Modules whose code determines the result of a run (with 'Model' or 'LockstepModel'), or the way it is stored
+# (the outputs of 'simulation.markov' are not cached)
+_model_modules = model, lockstep, parameters, backup, segments
+
+
+@functools.lru_cache(maxsize=None)
+def fingerprint():
+
+    """
+    Version of the model: hash of the code of the modules determining the result of a run
+    :return: Fingerprint (string)
+    """
+
+    h = hashlib.sha256()
+
+    for module in _model_modules:
+        with open(module.__file__, "rb") as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+def run_key(param):
+
+    """
+    Key of a run: hash of its normalized parameters and of the version of the model
+    :param param: Parameters of the run (arbitrary Python object)
+    :return: Key (string)
+    """
+
+    normalized = json.dumps(param.dict(), sort_keys=True)
+    return hashlib.sha256((normalized + fingerprint()).encode()).hexdigest()
+
+
+def run_keys(parameters_list):
+
+    """
+    :param parameters_list: Parameters of several runs (iterable, e.g. parameter table)
+    :return: Key of each run (list of strings)
+    """
+
+    return [run_key(param) for param in parameters_list]
+
+
+def pool_key(json_parameters):
+
+    """
+    Key of a pool: hash of its parameters, that describe all its runs, and of the version of the model
+    :param json_parameters: Parameters of the pool, with its settings as single values (dictionary;
+        see 'parameters.single_pool')
+    :return: Key (string)
+    """
+
+    normalized = json.dumps(json_parameters, sort_keys=True)
+    return hashlib.sha256((normalized + fingerprint()).encode()).hexdigest()
+
+
+def stored_key(key_file):
+
+    """
+    :param key_file: Path to the file where the key of some data has been written (string)
+    :return: Key (string; None if there is no such file)
+    """
+
+    if not os.path.exists(key_file):
+        return None
+
+    with open(key_file, "r") as f:
+        return f.read()
+
+
+def store_key(key_file, key):
+
+    """
+    Write the key of some data, once these data are saved
+    :param key_file: Path to the file (string)
+    :param key: Key (string)
+    """
+
+    with open(key_file, "w") as f:
+        f.write(key)
+
+
+def remove_key(key_file):
+
+    """
+    Remove the key of some data before overwriting them, so that they are not taken as valid
+    if the writing is interrupted
+    :param key_file: Path to the file (string)
+    """
+
+    if os.path.exists(key_file):
+        os.remove(key_file)
+
+
+class ResultCache:
+
+    """
+    Results of single runs, stored under their key ('run_key'): a run is only computed once
+    for given parameters and a given version of the model, whatever the pool it belongs to.
+    Runs are stored by chunks, one file of columns (see 'backup.run_columns') for each chunk,
+    and an index gives the chunk of each run and its position in it.
+    """
+
+    # Maximum number of keys by query
+    n_by_query = 500
+
+    def __init__(self, directory="simulation/results/cache"):
+
+        self.directory = directory
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.index = sqlite3.connect(os.path.join(directory, "index.sqlite3"))
+
+        with self.index:
+            self.index.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY)")
+            self.index.execute(
+                "CREATE TABLE IF NOT EXISTS runs (key BLOB PRIMARY KEY, chunk INTEGER, position INTEGER) "
+                "WITHOUT ROWID")
+
+    def _path(self, chunk):
+
+        return os.path.join(self.directory, "{}.npz".format(chunk))
+
+    def _locate(self, keys):
+
+        """
+        :param keys: Keys of runs (list of strings)
+        :return: Chunk and position of each run in the cache (dictionary of tuples)
+        """
+
+        locations = {}
+
+        for start in range(0, len(keys), self.n_by_query):
+
+            blobs = [bytes.fromhex(key) for key in keys[start:start + self.n_by_query]]
+
+            rows = self.index.execute(
+                "SELECT key, chunk, position FROM runs WHERE key IN ({})".format(",".join("?" * len(blobs))), blobs)
+
+            locations.update({key.hex(): (chunk, position) for key, chunk, position in rows})
+
+        return locations
+
+    def __contains__(self, key):
+
+        return key in self._locate([key])
+
+    def get(self, keys):
+
+        """
+        :param keys: Keys of runs (list of strings)
+        :return: Whether each run is in the cache (np.array of booleans), and columns of the ones that are,
+            in the order of the keys (dictionary of np.array; None if there is none)
+        """
+
+        locations = self._locate(keys)
+
+        found = np.array([key in locations for key in keys], dtype=bool)
+
+        if not locations:
+            return found, None
+
+        chunks, positions = np.array([locations[key] for key in keys if key in locations]).T
+
+        parts = []
+
+        for chunk in np.unique(chunks):
+
+            with np.load(self._path(chunk)) as f:
+                columns = {column: f[column] for column in backup.run_columns}
+
+            in_chunk = np.flatnonzero(chunks == chunk)
+            parts.append((in_chunk, backup.take_runs(columns, positions[in_chunk])))
+
+        return found, backup.merge_columns(parts)
+
+    def put(self, keys, columns):
+
+        """
+        :param keys: Keys of runs (list of strings)
+        :param columns: Columns of the runs (dictionary of np.array; see 'backup.run_columns')
+        """
+
+        if not len(keys):
+            return
+
+        with self.index:
+
+            chunk = self.index.execute("INSERT INTO chunks DEFAULT VALUES").lastrowid
+
+            # Write in a temporary file first, so that an interrupted write does not leave a corrupted chunk;
+            # the runs are only indexed once their chunk is written
+            tmp_path = "{}.tmp".format(self._path(chunk))
+
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **{column: columns[column] for column in backup.run_columns})
+
+            os.replace(tmp_path, self._path(chunk))
+
+            self.index.executemany(
+                "INSERT OR REPLACE INTO runs (key, chunk, position) VALUES (?, ?, ?)",
+                ((bytes.fromhex(key), chunk, position) for position, key in enumerate(keys)))
@@ -13,12 +13,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import multiprocessing as mlt
-import tqdm
+import contextlib
+import json
 import os
 import numpy as np
 
 import simulation.model as model
+import simulation.cache as cache
+import simulation.summary as summary
+import simulation.executor as executor
+import simulation.shared as shared
+import simulation.lockstep as lockstep
+import simulation.markov as markov
 
 import simulation.backup as backup
 import simulation.parameters as parameters
@@ -34,67 +40,366 @@ def run(param):
     return m.run()
 
 
-def produce_data(parameters_file, data_file):
+def run_lockstep(table):
 
     """
-    Produce data for 'pooled' condition using multiprocessing
+    Run all the economies together in a single process
+    :param table: Parameters of the economies (parameter table)
+    :return: Columns of the runs (dictionary of np.array; see 'backup.run_columns')
+    """
+
+    bkp = lockstep.LockstepModel(table).run()
+
+    return backup.encode_segments(
+        bkp.positions, bkp.price_indices, bkp.half_n_consumers, t_convergence=bkp.t_convergence, period=bkp.period)
+
+
+def _run_table_into_shared_arrays(task):
+
+    spec, start, table = task
+
+    arrays = shared.attach(spec)
+
+    # Time step of convergence and period of each run (-1 if none)
+    convergence = np.full((len(table), 2), -1, dtype=int)
+
+    for j, param in enumerate(table):
+
+        bkp = run(param)
+
+        for name, array in arrays.items():
+            array[start + j] = getattr(bkp, name)
+
+        for k, value in enumerate((bkp.t_convergence, bkp.period)):
+            if value is not None:
+                convergence[j, k] = value
+
+    return convergence
+
+
+def run_with_shared_memory(table, exe):
+
+    """
+    Run the economies with worker processes writing their results in place in shared memory,
+    instead of sending back their backup; the results are run-length encoded straight from the shared memory
+    :param table: Parameters of the economies (parameter table), sent to the workers by slices
+    :param exe: Executor (arbitrary Python object)
+    :return: Columns of the runs (dictionary of np.array; see 'backup.run_columns')
+    """
+
+    n_runs = len(table)
+    param = table[0]
+
+    shapes = {name: (n_runs, param.t_max, 2) for name in backup.CompactRunBackup.fields}
+    dtypes = backup.compact_dtypes(param.n_positions, param.n_prices)
+
+    with shared.SharedArrays(shapes=shapes, dtypes=dtypes) as shared_arrays:
+
+        n_by_task = exe.get_chunksize(n_runs)
+        tasks = [
+            (shared_arrays.spec, start, table[start:start + n_by_task]) for start in range(0, n_runs, n_by_task)]
+
+        convergence = np.concatenate(exe.map(_run_table_into_shared_arrays, tasks))
+
+        return backup.encode_segments(
+            t_convergence=convergence[:, 0], period=convergence[:, 1], **shared_arrays.arrays)
+
+
+def _tables_to_warm_up(parameters_list):
+
+    """
+    :param parameters_list: Parameters of the runs to come (iterable, parameter table or sweep,
+        expanded chunk by chunk)
+    :return: Parameters of a run for each distinct configuration of the tables (list)
+    """
+
+    if isinstance(parameters_list, (parameters.Sweep, parameters.ParameterTable)):
+
+        to_warm_up = {}
+
+        for table in parameters_list.chunks(10000):
+
+            keys, first_rows = np.unique(table.tables_keys(), axis=0, return_index=True)
+
+            for key, i in zip(map(tuple, keys.tolist()), first_rows):
+                to_warm_up.setdefault(key, table[int(i)])
+
+        return list(to_warm_up.values())
+
+    to_warm_up = {}
+
+    for p in parameters_list:
+        to_warm_up[model.tables_key(p), p.move] = p
+
+    return list(to_warm_up.values())
+
+
+def get_executor(parameters_list, n_workers=None, chunksize=None):
+
+    """
+    Create an executor whose workers compute once for all the tables needed for the given parameters
+    :param parameters_list: Parameters of the runs to come (iterable)
+    :param n_workers: Number of worker processes (default: number of CPUs)
+    :param chunksize: Number of runs sent at once to a worker (default: a few chunks per worker)
+    :return: An executor, to be used as a context manager (arbitrary Python object)
+    """
+
+    return executor.Executor(
+        n_workers=n_workers, chunksize=chunksize,
+        initializer=model.fill_cache, initargs=(_tables_to_warm_up(parameters_list), ))
+
+
+def _executor_context(exe, parameters_list):
+
+    """
+    Use the given executor (without shutting it down) or, if there is something to produce, a new one
+    :param exe: Executor (arbitrary Python object or None)
+    :param parameters_list: Parameters of the runs to produce (iterable)
+    :return: A context manager giving the executor
+    """
+
+    if exe is not None:
+        return contextlib.nullcontext(exe)
+
+    to_warm_up = _tables_to_warm_up(parameters_list)
+
+    if not to_warm_up:
+        return contextlib.nullcontext(None)
+
+    return executor.Executor(initializer=model.fill_cache, initargs=(to_warm_up, ))
+
+
+def _run_table(table):
+
+    return backup.concatenate_segments([backup.CompressedRunBackup.encode(run(param)) for param in table])
+
+
+def _compute(table, use_lockstep, use_shared_memory, exe):
+
+    """
+    Run some economies
+    :param table: Parameters of the economies (parameter table)
+    :param exe: Executor (arbitrary Python object; None with 'use_lockstep')
+    :return: Columns of the runs (dictionary of np.array; see 'backup.run_columns')
+    """
+
+    if use_lockstep:
+        return run_lockstep(table)
+
+    if use_shared_memory:
+        return run_with_shared_memory(table, exe)
+
+    # Workers receive slices of the table, several runs at a time
+    n_by_task = exe.get_chunksize(len(table))
+    tasks = [table[start:start + n_by_task] for start in range(0, len(table), n_by_task)]
+
+    return backup.concatenate_columns(exe.map(_run_table, tasks))
+
+
+def produce_data(parameters_file, data_file, use_lockstep=False, use_shared_memory=False, exe=None, force=False,
+                 chunk_size=1000):
+
+    """
+    Produce data for 'pooled' condition using multiprocessing,
+    only running the economies whose results are not already in the cache.
+    Runs are streamed: completed runs are put in the cache as they come (so that an interrupted production resumes
+    where it stopped) and written in the columns of the pool backup on disk, while summary statistics are updated,
+    without keeping them in memory.
     :param parameters_file: Path to parameters file (string)
-    :param data_file: Path to the future data files (dictionary with two entries)
-    :return: a 'pool backup' (arbitrary Python object)
+    :param data_file: Path to the future data directory, with one file per column (string)
+    :param use_lockstep: Run all the economies together in the current process instead (bool)
+    :param use_shared_memory: Workers write their results in shared memory instead of sending them back (bool)
+    :param exe: Executor to use (arbitrary Python object; default: an executor is created if needed)
+    :param force: Run all the economies, even the ones in the cache (bool)
+    :param chunk_size: Number of economies computed by chunk (int)
+    :return: a 'pool backup', whose columns are memory-mapped (arbitrary Python object)
     """
 
-    json_parameters = parameters.load(parameters_file)
+    # Settings as single values, as expected by the writer and the summary (e.g. for the data type of 'move')
+    json_parameters = parameters.single_pool(parameters.load(parameters_file))
+    table = parameters.pool_parameters(json_parameters)
 
-    pool_parameters = parameters.extract_parameters(json_parameters)
+    result_cache = cache.ResultCache()
 
-    pl = mlt.Pool()
+    writer = backup.PoolBackupWriter(
+        parameters=json_parameters, parameters_file=parameters_file, data_file=data_file, n_runs=len(table))
+    pool_summary = summary.Summary(
+        n_positions=json_parameters["n_positions"], t_max=json_parameters["t_max"],
+        prices_grid=backup.price_grid(json_parameters))
 
-    backups = []
+    with contextlib.ExitStack() as stack:
+
+        for chunk_table in table.chunks(chunk_size):
+
+            keys = cache.run_keys(chunk_table)
 
-    for bkp in tqdm.tqdm(
-            pl.imap_unordered(run, pool_parameters),
-            total=len(pool_parameters)):
-        backups.append(bkp)
+            # Runs in the cache (including the ones of an interrupted production)
+            if force:
+                found, cached = np.zeros(len(keys), dtype=bool), None
 
-    pool_backup = backup.PoolBackup(parameters=json_parameters, backups=backups)
-    pool_backup.save(parameters_file, data_file)
+            else:
+                found, cached = result_cache.get(keys)
+
+            parts = [] if cached is None else [(np.flatnonzero(found), cached)]
+
+            to_run = np.flatnonzero(~found)
+
+            if len(to_run):
+
+                # An executor is only created once there is something to compute
+                if exe is None and not use_lockstep:
+                    exe = stack.enter_context(_executor_context(None, table))
+
+                computed = _compute(
+                    chunk_table[to_run], use_lockstep=use_lockstep, use_shared_memory=use_shared_memory, exe=exe)
+
+                result_cache.put([keys[i] for i in to_run], computed)
+                parts.append((to_run, computed))
+
+            columns = backup.merge_columns(parts)
+
+            writer.write(chunk_table, columns)
+            pool_summary.update(chunk_table.r, columns)
 
-    return pool_backup
+    # The columns of a previous production are replaced: they are only valid again once the new key is stored
+    key_file = os.path.join(data_file, "key")
+    cache.remove_key(key_file)
 
+    writer.close()
+    pool_summary.save(os.path.join(data_file, "summary.json"))
 
-def data_already_produced(*args):
+    cache.store_key(key_file, cache.pool_key(json_parameters))
+
+    return backup.PoolBackup.load(data_file)
+
+
+def produce_pools(parameters_file, data_directory, force=False, use_lockstep=False, exe=None, **kwargs):
 
     """
-    If data files already exist, return True
-    :param args: Path to data files
-    :return: True or False
+    Produce (if their parameters or the model changed) or load data for each pool of a sweep
+    whose settings have several values (see 'parameters.Sweep.pools')
+    :param parameters_file: Path to the parameters file of the sweep (string)
+    :param data_directory: Path to the future directory of the pools, with the parameters file
+        and the data directory of each pool (string)
+    :param force: Run all the economies, even the ones in the cache (bool)
+    :param use_lockstep: Run all the economies of a pool together in the current process (bool)
+    :param exe: Executor to use (arbitrary Python object; default: one executor is created for all the pools)
+    :param kwargs: Additional arguments of 'produce_data' (e.g. 'use_shared_memory')
+    :return: a 'pool backup' for each pool, in the order of the sweep (list)
     """
-    return np.all([os.path.exists(i) for i in args])
 
+    sweep = parameters.Sweep(parameters.load(parameters_file))
+
+    os.makedirs(data_directory, exist_ok=True)
+
+    files = []
+    to_produce = []
+
+    for k, json_parameters in enumerate(sweep.pools()):
+
+        pool_parameters_file = os.path.join(data_directory, "{}.json".format(k))
+        pool_data_file = os.path.join(data_directory, str(k))
+
+        with open(pool_parameters_file, "w") as f:
+            json.dump(json_parameters, f, indent=2)
+
+        files.append((pool_parameters_file, pool_data_file))
 
-def pool(force=False):
+        if force or cache.stored_key(os.path.join(pool_data_file, "key")) != cache.pool_key(json_parameters):
+            to_produce.append(k)
+
+    backups = []
+
+    to_warm_up = [] if use_lockstep else [
+        param for k in to_produce
+        for param in _tables_to_warm_up(parameters.pool_parameters(parameters.load(files[k][0])))]
+
+    with _executor_context(exe, to_warm_up) as exe:
+
+        for k, (pool_parameters_file, pool_data_file) in enumerate(files):
+
+            if k in to_produce:
+                pool_backup = produce_data(
+                    pool_parameters_file, pool_data_file, use_lockstep=use_lockstep, exe=exe, force=force, **kwargs)
+
+            else:
+                pool_backup = backup.PoolBackup.load(pool_data_file)
+
+            backups.append(pool_backup)
+
+    return backups
+
+
+def _pooled_data(condition, force, use_lockstep, use_shared_memory, exe):
+
+    """
+    Produce (if their parameters or the model changed) or load data for each heuristic for 'pooled' or 'batch' condition
+    :param condition: "pool" or "batch" (string)
+    :param force: Run all the economies, even the ones in the cache (bool)
+    :param use_lockstep: Run all the economies of a heuristic together in the current process (bool)
+    :param use_shared_memory: Workers write their results in shared memory instead of sending them back (bool)
+    :param exe: Executor to use (arbitrary Python object; default: one executor is created for all the heuristics)
+    :return: a 'pool backup' for each heuristic (dictionary)
+    """
 
     heuristics = model.get_heuristics()
 
-    backups = {}
+    files = {
+        h: ("simulation/results/json/{}_{}.json".format(condition, h),
+            "simulation/results/npy/{}_{}".format(condition, h))
+        for h in heuristics
+    }
+
+    to_produce = {}
 
     for h in heuristics:
 
-        parameters_file = "simulation/results/json/pool_{}.json".format(h)
-        data_file = "simulation/results/pickle/pool_{}.p".format(h)
+        parameters_file, data_file = files[h]
 
-        if not data_already_produced(data_file) or force:
-            pool_backup = produce_data(parameters_file, data_file)
+        json_parameters = parameters.load(parameters_file)
 
-        else:
-            pool_backup = backup.PoolBackup.load(data_file)
+        key = cache.pool_key(parameters.single_pool(json_parameters))
+
+        if force or cache.stored_key(os.path.join(data_file, "key")) != key:
+            to_produce[h] = json_parameters
+
+    to_warm_up = [] if use_lockstep else [
+        param for json_parameters in to_produce.values()
+        for param in _tables_to_warm_up(parameters.pool_parameters(json_parameters))]
+
+    backups = {}
+
+    with _executor_context(exe, to_warm_up) as exe:
+
+        for h in heuristics:
+
+            parameters_file, data_file = files[h]
 
-        backups[h] = pool_backup
+            if h in to_produce:
+                pool_backup = produce_data(
+                    parameters_file, data_file,
+                    use_lockstep=use_lockstep, use_shared_memory=use_shared_memory, exe=exe, force=force)
+
+            else:
+                pool_backup = backup.PoolBackup.load(data_file)
+
+            backups[h] = pool_backup
 
     return backups
 
 
-def batch(force=False):
+def pool(force=False, use_lockstep=False, use_shared_memory=False, exe=None):
+
+    return _pooled_data(
+        "pool", force=force, use_lockstep=use_lockstep, use_shared_memory=use_shared_memory, exe=exe)
+
+
+def expected():
+
+    """
+    Exact expected dynamics for each heuristic, using the settings of the 'pooled' condition
+    :return: For each heuristic, a backup for each effective radius (dictionary)
+    """
 
     heuristics = model.get_heuristics()
 
@@ -102,43 +407,72 @@ def batch(force=False):
 
     for h in heuristics:
 
-        parameters_file = "simulation/results/json/batch_{}.json".format(h)
-        data_file = "simulation/results/pickle/batch_{}.p".format(h)
-
-        if not data_already_produced(data_file) or force:
-            batch_backup = produce_data(parameters_file, data_file)
+        parameters_file = "simulation/results/json/pool_{}.json".format(h)
 
-        else:
-            batch_backup = backup.PoolBackup.load(data_file)
+        json_parameters = parameters.load(parameters_file)
+        param = parameters.extract_parameters(json_parameters)[0]
 
-        backups[h] = batch_backup
+        backups[h] = markov.run_over_effective_radii(param)
 
     return backups
 
 
-def individual(force=False):
+def batch(force=False, use_lockstep=False, use_shared_memory=False, exe=None):
+
+    return _pooled_data(
+        "batch", force=force, use_lockstep=use_lockstep, use_shared_memory=use_shared_memory, exe=exe)
+
+
+def individual(force=False, exe=None):
+
+    """
+    Produce (if their parameters or the model changed) or load the data of single runs for each heuristic
+    :param force: Run all the economies, even the ones in the cache (bool)
+    :param exe: Executor to use (arbitrary Python object; default: an executor is created if needed)
+    :return: For each heuristic, a backup for 'r' equal to 0.25 and 0.50 (dictionary of dictionaries)
+    """
 
     heuristics = model.get_heuristics()
 
     backups = {i: dict() for i in heuristics}
 
-    for h in heuristics:
+    files = {
+        (h, r): ("simulation/results/json/{}_{}.json".format(r, h), "simulation/results/pickle/{}_{}.p".format(r, h))
+        for h in heuristics for r in ("25", "50")
+    }
 
-        for r in ("25", "50"):
+    individual_parameters = {k: parameters.extract_parameters(parameters.load(files[k][0])) for k in files}
+    keys = {k: cache.run_key(param) for k, param in individual_parameters.items()}
 
-            parameters_file = "simulation/results/json/{}_{}.json".format(r, h)
-            data_file = "simulation/results/pickle/{}_{}.p".format(r, h)
+    result_cache = cache.ResultCache()
 
-            if not data_already_produced(parameters_file, data_file) or force:
+    to_produce = [k for k in files if force or keys[k] not in result_cache]
 
-                json_parameters = parameters.load(parameters_file)
-                param = parameters.extract_parameters(json_parameters)
-                run_backup = run(param)
-                run_backup.save(parameters_file, data_file)
+    produced = {}
 
-            else:
-                run_backup = backup.RunBackup.load(data_file)
+    with _executor_context(exe, [individual_parameters[k] for k in to_produce]) as exe:
+
+        if to_produce:
+            backups_produced = exe.map(run, [individual_parameters[k] for k in to_produce])
+            produced = {k: backup.CompressedRunBackup.encode(b) for k, b in zip(to_produce, backups_produced)}
+
+    # The runs produced are put in the cache as a single chunk
+    if produced:
+        result_cache.put([keys[k] for k in produced], backup.concatenate_segments(list(produced.values())))
+
+    for (h, r), (parameters_file, data_file) in files.items():
+
+        param = individual_parameters[h, r]
+
+        if (h, r) in produced:
+            run_backup = produced[h, r]
+            run_backup.save(parameters_file, data_file)
+
+        else:
+            _, columns = result_cache.get([keys[h, r]])
+            run_backup, = backup.split_segments(
+                columns, [param], t_max=param.t_max, prices_grid=backup.price_grid(param))
 
-            backups[h][r] = run_backup
+        backups[h][r] = run_backup
 
     return backups
@@ -0,0 +1,128 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+import multiprocessing as mlt
+from multiprocessing import resource_tracker
+import os
+import tqdm
+
+
+class _Indexed:
+
+    """
+    Picklable wrapper of a function, keeping track of the index of the element it is applied to.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, indexed_element):
+        i, element = indexed_element
+        return i, self.func(element)
+
+
+class Executor:
+
+    """
+    Pool of worker processes, to be used as a context manager (the workers are shut down when leaving it).
+    The same executor can be used for several maps.
+    """
+
+    def __init__(self, n_workers=None, chunksize=None, initializer=None, initargs=()):
+
+        self.n_workers = n_workers if n_workers is not None else os.cpu_count()
+        self.chunksize = chunksize
+
+        self.initializer = initializer
+        self.initargs = initargs
+
+        self._pool = None
+
+    def __enter__(self):
+
+        # Workers have to share the resource tracker of the parent process (for shared memory), so start it first
+        if os.name == "posix":
+            resource_tracker.ensure_running()
+
+        self._pool = mlt.Pool(processes=self.n_workers, initializer=self.initializer, initargs=self.initargs)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        if exc_type is None:
+            self._pool.close()
+
+        else:
+            self._pool.terminate()
+
+        self._pool.join()
+        self._pool = None
+
+    def get_chunksize(self, n):
+
+        """
+        Number of elements sent at once to a worker: several elements per message,
+        while keeping a few chunks per worker for balancing the load
+        :param n: Number of elements (int)
+        :return: Chunk size (int)
+        """
+
+        return self.chunksize if self.chunksize is not None else max(1, n // (4 * self.n_workers))
+
+    def imap(self, func, elements, n_elements=None, window=None, chunksize=None):
+
+        """
+        Apply a function to each element, yielding the results as soon as they are available
+        :param func: Function to apply (should be picklable, e.g. defined at the top level of a module)
+        :param elements: Elements (list, or any iterable if 'n_elements' is given)
+        :param n_elements: Number of elements (int; default: length of 'elements')
+        :param window: Maximum number of elements taken from 'elements' whose results are not yet yielded
+            (int; default: no limit), for bounding the memory used when the results are consumed slowly
+        :param chunksize: Number of elements sent at once to a worker (int; default: see 'get_chunksize')
+        :return: Iterator over the index of each element and the corresponding result (tuples)
+        """
+
+        n_elements = len(elements) if n_elements is None else n_elements
+        window = n_elements if window is None else window
+
+        iterator = iter(elements)
+        chunksize = self.get_chunksize(min(n_elements, window)) if chunksize is None else chunksize
+
+        with tqdm.tqdm(total=n_elements) as progress_bar:
+
+            for start in range(0, n_elements, max(1, window)):
+
+                indexed_elements = enumerate(itertools.islice(iterator, window), start)
+
+                for result in self._pool.imap_unordered(_Indexed(func), indexed_elements, chunksize=chunksize):
+                    progress_bar.update()
+                    yield result
+
+    def map(self, func, elements):
+
+        """
+        Apply a function to each element
+        :param func: Function to apply (should be picklable, e.g. defined at the top level of a module)
+        :param elements: Elements (list)
+        :return: Results, in the same order as the elements (list)
+        """
+
+        results = [None] * len(elements)
+
+        for i, result in self.imap(func, elements):
+            results[i] = result
+
+        return results
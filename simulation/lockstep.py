@@ -0,0 +1,173 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+import simulation.backup as backup
+import simulation.model as model
+
+
+class LockstepModel:
+
+    """
+    Run several economies sharing the same settings (but not necessarily the same 'r')
+    by advancing all of them together at each time step.
+    """
+
+    def __init__(self, parameters_list):
+
+        self.parameters = parameters_list
+
+        param = parameters_list[0]
+
+        for p in parameters_list:
+            assert (p.n_positions, p.n_prices, p.p_min, p.p_max, p.t_max, p.move) == \
+                   (param.n_positions, param.n_prices, param.p_min, param.p_max, param.t_max, param.move), \
+                "All the economies have to share the same settings (except 'r' and 'seed')."
+
+        # Each economy has its own generator, used as it would be by its 'Model'
+        self.rngs = [np.random.default_rng(p.seed_sequence()) for p in parameters_list]
+
+        self.n_runs = len(parameters_list)
+        self.t_max = param.t_max
+        self.n_positions = param.n_positions
+        self.n_prices = param.n_prices
+
+        # Economies with the same effective radius share the same tables
+        self.idx_table = np.zeros(self.n_runs, dtype=int)
+
+        idx_models = {}
+        models = []
+
+        for i, p in enumerate(parameters_list):
+
+            key = model.tables_key(p)
+
+            if key not in idx_models:
+                idx_models[key] = len(models)
+                models.append(model.Model(p))
+
+            self.idx_table[i] = idx_models[key]
+
+        self.strategies = models[0].strategies
+        self.prices = models[0].prices
+        self.n_strategies = models[0].n_strategies
+
+        self.best_responses = np.array([m.best_responses for m in models])
+
+        # Compact encoding of each move, and twice the numbers of consumers (multiples of 0.5) for each pair of moves
+        dtypes = backup.compact_dtypes(self.n_positions, self.n_prices)
+
+        self.move_positions = self.strategies[:, 0].astype(dtypes["positions"])
+        self.move_price_indices = self.strategies[:, 1].astype(dtypes["price_indices"])
+        self.half_n_consumers = np.array([2 * m.exp_n_consumers for m in models]).astype(dtypes["half_n_consumers"])
+
+    def _select(self, selectable, runs):
+
+        """
+        For each economy, select randomly one of the selectable moves
+        :param selectable: Selectable moves (np.array of booleans of dimension len(runs), n_strategies)
+        :param runs: Indices of the economies (np.array)
+        :return: Selected moves, and whether there was a tie (tuple of np.array of length len(runs))
+        """
+
+        n_selectable = np.sum(selectable, axis=1)
+
+        # Rank of the selected move among the selectable ones (draw only in case of ties, as 'Model.move')
+        rank = np.zeros(len(runs), dtype=int)
+
+        for j in np.flatnonzero(n_selectable > 1):
+            rank[j] = self.rngs[runs[j]].integers(n_selectable[j])
+
+        return np.argmax(np.cumsum(selectable, axis=1) > rank[:, None], axis=1), n_selectable > 1
+
+    def run(self):
+
+        """
+        Run simulation of all the economies.
+        As with 'Model.run', an economy stops as soon as it is caught in a deterministic cycle (it is then no longer
+        advanced with the others), the remaining time steps being filled by repeating the cycle.
+        :return: A backup whose arrays have an additional first dimension for the economies,
+            't_convergence' and 'period' giving the cycle of each economy (np.array; -1 if never)
+            (arbitrary Python object)
+        """
+
+        # For recording: index of the move of each firm, with a small integer type
+        recorded_moves = np.zeros((self.n_runs, self.t_max, 2), dtype=backup.int_dtype(self.n_strategies))
+
+        moves = np.zeros((self.n_runs, 2), dtype=int)
+
+        active = 0
+
+        moves[:, 0] = -99
+        moves[:, 1] = [rng.integers(self.n_strategies) for rng in self.rngs]
+
+        t_convergence = np.full(self.n_runs, -1)
+        period = np.full(self.n_runs, -1)
+
+        # Economies not yet caught in a cycle, and last time step at which each economy chose among ties
+        runs = np.arange(self.n_runs)
+        last_tie = np.full(self.n_runs, -1)
+
+        for t in range(self.t_max):
+
+            passive = (active + 1) % 2  # Get passive id
+
+            # As 'Model.run': the state (moves, active) of an economy is compared with its states reached since
+            # its last tie with the same active firm (every other time step)
+            lags = np.arange(2, t - np.min(last_tie[runs], initial=t), 2)
+
+            if len(lags):
+
+                current = recorded_moves[runs, t - 1][:, None]
+                previous = recorded_moves[runs[:, None], np.maximum(t - 1 - lags, 0)]
+
+                same = np.all(previous == current, axis=2) & (lags < t - last_tie[runs][:, None]) & (lags < t)
+
+                caught = np.any(same, axis=1)
+
+                t_convergence[runs[caught]] = t
+                period[runs[caught]] = lags[np.argmax(same[caught], axis=1)]
+
+                runs = runs[~caught]
+                moves = moves[~caught]
+
+                if not len(runs):
+                    break
+
+            # Make play active firms
+            moves[:, active], tie = self._select(self.best_responses[self.idx_table[runs], moves[:, passive]], runs)
+            last_tie[runs[tie]] = t
+
+            # Record for further analysis
+            recorded_moves[runs, t] = moves
+
+            active = passive  # Inverse role
+
+        # Extrapolate the cycles for the remaining time steps
+        t = np.arange(self.t_max)[None, :]
+        t_stored = np.where(t_convergence >= 0, t_convergence, self.t_max)[:, None]
+        p = np.maximum(period, 1)[:, None]
+
+        idx = np.where(t < t_stored, t, t_stored - p + (t - t_stored) % p)
+        recorded_moves = recorded_moves[np.arange(self.n_runs)[:, None], idx]
+
+        return backup.CompactRunBackup(
+            parameters=self.parameters,
+            positions=self.move_positions[recorded_moves],
+            price_indices=self.move_price_indices[recorded_moves],
+            half_n_consumers=self.half_n_consumers[
+                self.idx_table[:, None], recorded_moves[..., 0], recorded_moves[..., 1]],
+            prices_grid=self.prices, t_convergence=t_convergence, period=period)
@@ -0,0 +1,131 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import numpy as np
+import scipy.sparse
+
+import simulation.backup as backup
+import simulation.model as model
+
+
+class MarkovModel:
+
+    """
+    Exact distribution of the dynamics of an economy.
+    At each time step, the active firm selects uniformly one of its best responses to the move of the passive firm,
+    so the state (move0, move1, active) only matters through the move of the passive firm:
+    its distribution follows a Markov chain whose transition matrix are the normalized best responses.
+    """
+
+    def __init__(self, param):
+
+        self.parameters = param
+
+        m = model.Model(param)
+
+        self.t_max = m.t_max
+
+        # Transitions from the move of the passive firm to the move of the active firm
+        best_responses = scipy.sparse.coo_matrix(m.best_responses)
+        passive, active = best_responses.row, best_responses.col
+        proba = 1 / np.sum(m.best_responses, axis=1)[passive]
+
+        self.transitions = scipy.sparse.csr_matrix((proba, (passive, active)), shape=best_responses.shape)
+
+        # For each move of the passive firm, expected values of each recorded variable
+        # (for the active firm, for the passive firm); for the tables, the active firm plays the role of firm 0
+        positions = m.strategies[:, 0]
+        prices = m.prices[m.strategies[:, 1]]
+        n_consumers = m.exp_n_consumers[active, passive]
+        profits = m.exp_profits[active, passive]
+
+        def expected(x):
+            return np.bincount(passive, weights=proba * x, minlength=m.n_strategies)
+
+        self.expected_positions = np.column_stack((self.transitions @ positions, positions))
+        self.expected_prices = np.column_stack((self.transitions @ prices, prices))
+        self.expected_n_consumers = np.column_stack((expected(n_consumers[:, 0]), expected(n_consumers[:, 1])))
+        self.expected_profits = np.column_stack((expected(profits[:, 0]), expected(profits[:, 1])))
+        self.expected_distance = expected(np.absolute(positions[active] - positions[passive]))
+
+        self.n_strategies = m.n_strategies
+
+    def run(self):
+
+        """
+        Propagate the distribution of the move of the passive firm over time.
+        :return: A backup containing the expected values at each time step (arbitrary Python object)
+        """
+
+        positions = np.zeros((self.t_max, 2))
+        prices = np.zeros((self.t_max, 2))
+        n_consumers = np.zeros((self.t_max, 2))
+        profits = np.zeros((self.t_max, 2))
+        distance = np.zeros(self.t_max)
+
+        # At t = 0, firm 1 is passive and its move is random
+        proba = np.ones(self.n_strategies) / self.n_strategies
+
+        active = 0
+
+        for t in range(self.t_max):
+
+            passive = (active + 1) % 2  # Get passive id
+
+            idx = [active, passive]
+
+            positions[t, idx] = proba @ self.expected_positions
+            prices[t, idx] = proba @ self.expected_prices
+            n_consumers[t, idx] = proba @ self.expected_n_consumers
+            profits[t, idx] = proba @ self.expected_profits
+            distance[t] = proba @ self.expected_distance
+
+            # Distribution of the move of the active firm, which will be passive at t + 1
+            proba = self.transitions.T @ proba
+
+            active = passive  # Inverse role
+
+        return backup.ExpectedRunBackup(
+            parameters=self.parameters, positions=positions, prices=prices, profits=profits,
+            n_consumers=n_consumers, distance=distance)
+
+
+def run(param):
+
+    m = MarkovModel(param)
+    return m.run()
+
+
+def run_over_effective_radii(param):
+
+    """
+    Compute the expected dynamics for every effective radius of the grid
+    (the dynamics only depend on 'r' through the effective radius)
+    :param param: Parameters giving the settings of the grid and the heuristic (arbitrary Python object)
+    :return: A backup for each effective radius (list)
+    """
+
+    backups = []
+
+    for effective_radius in range(param.n_positions):
+
+        p = copy.copy(param)
+        p.r = (effective_radius + 0.5) / param.n_positions
+        p.check()
+
+        backups.append(run(p))
+
+    return backups
@@ -20,11 +20,44 @@ import enum
 import simulation.backup as backup
 
 
+# Tables of the models, shared by all the models of the process having the same key
+_tables = {}
+
+
 def get_heuristics():
     return [str(i).replace("Move.", "") for i in
             (Move.max_profit, Move.max_diff, Move.equal_sharing)]
 
 
+def tables_key(param):
+
+    """
+    Key identifying the tables of a model: with the same grid, the tables only depend on the effective radius
+    :param param: Parameters of the model (arbitrary Python object)
+    :return: Effective radius, n_positions, n_prices, p_min and p_max (tuple)
+    """
+
+    return int(param.r * param.n_positions), param.n_positions, param.n_prices, param.p_min, param.p_max
+
+
+def fill_cache(parameters_list):
+
+    """
+    Compute the tables for every distinct configuration (e.g. as initializer of worker processes)
+    :param parameters_list: Parameters of the models to come (list)
+    """
+
+    done = set()
+
+    for param in parameters_list:
+
+        key = tables_key(param), param.move
+
+        if key not in done:
+            Model(param)
+            done.add(key)
+
+
 class Move(enum.Enum):
 
     max_profit = enum.auto()
@@ -39,7 +72,7 @@ class Model:
 
         self.parameters = param
 
-        np.random.seed(param.seed)
+        self.rng = np.random.default_rng(param.seed_sequence())
 
         self.n_positions = param.n_positions
         self.n_prices = param.n_prices
@@ -60,16 +93,41 @@ class Model:
         self.idx_strategies = np.arange(self.n_strategies)
 
         # Prepare useful arrays
-        self.n_consumers = self.compute_n_consumers()
+        self.load_tables()
+
+    def load_tables(self):
+
+        """
+        Set the tables of the model, computing them only if no model with the same key
+        (and, for the best responses, the same heuristic) has been created before in this process.
+        """
+
+        key = tables_key(self.parameters)
+
+        if key not in _tables:
+
+            self.n_consumers = self.compute_n_consumers()
+            self.exp_n_consumers, self.exp_profits = self.compute_exp_profits()
+
+            _tables[key] = {
+                "n_consumers": self.n_consumers,
+                "exp_n_consumers": self.exp_n_consumers,
+                "exp_profits": self.exp_profits
+            }
+
+        tables = _tables[key]
 
-        self.move = {
+        self.n_consumers = tables["n_consumers"]
+        self.exp_n_consumers = tables["exp_n_consumers"]
+        self.exp_profits = tables["exp_profits"]
 
-            Move.max_profit: self.move_profit_based,
-            Move.max_diff: self.move_diff_based,
-            Move.equal_sharing: self.move_equal_sharing,
-            Move.strategic: self.move_profit_strategic_based
+        if self.parameters.move not in tables:
+            tables[self.parameters.move] = self.compute_best_responses()
 
-        }[self.parameters.move]
+        self.best_responses = tables[self.parameters.move]
+
+        for table in tables.values():
+            table.setflags(write=False)  # Shared, so should not be modified
 
     def compute_n_consumers(self):
         
@@ -81,33 +139,26 @@ class Model:
         (np.array of dimension n_position, n_position, 3).  
         """
 
+        # Consumer x sees a firm located in i iff |x - i| <= r,
+        # so the consumers seeing a firm located in i are the ones in the field of view of i
+        field_of_view = np.asarray(self.field_of_view(np.arange(self.n_positions)))  # 2: min, max
+
+        n_seeing = field_of_view[1] - field_of_view[0] + 1
+
+        # Overlap of the two intervals of consumers
+        n_shared = np.maximum(
+            np.minimum(field_of_view[1][:, None], field_of_view[1][None, :]) -
+            np.maximum(field_of_view[0][:, None], field_of_view[0][None, :]) + 1,
+            0)
+
         z = np.zeros((self.n_positions, self.n_positions, 3), dtype=int)
         # Last parameter is idx0: n consumers seeing only A,
         #                   idx1: n consumers seeing only B,
         #                   idx2: consumers seeing A and B,
 
-        field_of_view = np.zeros((self.n_positions, 2))  # 2: min, max
-        field_of_view[:] = [self.field_of_view(x) for x in range(self.n_positions)]
-
-        for i, j in itertools.combinations_with_replacement(range(self.n_positions), r=2):
-
-            for x in range(self.n_positions):
-
-                see_firm_0 = field_of_view[x, 0] <= i <= field_of_view[x, 1]
-                see_firm_1 = field_of_view[x, 0] <= j <= field_of_view[x, 1]
-
-                if see_firm_0 and see_firm_1:
-                    z[i, j, 2] += 1
-
-                elif see_firm_0:
-                    z[i, j, 0] += 1
-
-                elif see_firm_1:
-                    z[i, j, 1] += 1
-
-            z[j, i, 0] = z[i, j, 1]
-            z[j, i, 1] = z[i, j, 0]
-            z[j, i, 2] = z[i, j, 2]
+        z[:, :, 0] = n_seeing[:, None] - n_shared
+        z[:, :, 1] = n_seeing[None, :] - n_shared
+        z[:, :, 2] = n_shared
 
         return z
 
@@ -115,19 +166,49 @@ class Model:
         
         """
         Compute the field of view for a consumer
-        :param x: Position of the consumer (int)
+        :param x: Position of the consumer (int or np.array of positions)
         :return: Min and max of the field of view (list)
         """
 
         r = int(self.r * self.n_positions)
 
         field_of_view = [
-            max(x - r, 0),
-            min(x + r, self.n_positions - 1)
+            np.maximum(x - r, 0),
+            np.minimum(x + r, self.n_positions - 1)
         ]
 
         return field_of_view
 
+    def compute_exp_profits(self):
+
+        """
+        Compute the expected number of consumers and expected profits for each combination of moves.
+        :return: Expected number of consumers and expected profits of firm 0 and firm 1
+        for each combination of moves (tuple of two np.array of dimension n_strategies, n_strategies, 2).
+        """
+
+        positions = self.strategies[:, 0]
+        idx_prices = self.strategies[:, 1]
+
+        z = self.n_consumers[positions[:, None], positions[None, :]]
+
+        # Part of the shared consumers going to firm 0: all if cheaper, half if same price, none otherwise
+        share = np.where(
+            idx_prices[:, None] == idx_prices[None, :], 0.5, (idx_prices[:, None] < idx_prices[None, :]) * 1.
+        )
+
+        exp_n_consumers = np.zeros((self.n_strategies, self.n_strategies, 2))
+        exp_n_consumers[:, :, 0] = z[:, :, 0] + z[:, :, 2] * share
+        exp_n_consumers[:, :, 1] = z[:, :, 1] + z[:, :, 2] * (1 - share)
+
+        strategy_prices = self.prices[idx_prices]
+
+        exp_profits = np.zeros((self.n_strategies, self.n_strategies, 2))
+        exp_profits[:, :, 0] = exp_n_consumers[:, :, 0] * strategy_prices[:, None]
+        exp_profits[:, :, 1] = exp_n_consumers[:, :, 1] * strategy_prices[None, :]
+
+        return exp_n_consumers, exp_profits
+
     def profits_given_position_and_price(self, move0, move1, n_consumers=None):
         
         """
@@ -139,7 +220,7 @@ class Model:
         """
 
         if n_consumers is None:
-            n_consumers = self.get_n_consumers_given_moves(move0=move0, move1=move1)
+            return self.exp_profits[move0, move1]
 
         return n_consumers * self.prices[
             self.strategies[(move0, move1), 1]  # In strategies, idx of prices are stored, not prices themselves
@@ -155,132 +236,175 @@ class Model:
         :return: Number of expected consumers for both firms (np.array of length 2)
         """
 
-        pos0, price0 = self.strategies[move0, :]
-        pos1, price1 = self.strategies[move1, :]
+        return self.exp_n_consumers[move0, move1]
 
-        n_consumers = np.zeros(2)
-        n_consumers[:] = self.n_consumers[pos0, pos1, :2]
+    def compute_best_responses(self):
 
-        to_share = self.n_consumers[pos0, pos1, 2]
+        """
+        For each move of the opponent, compute the moves that the heuristic could select.
+        :return: Selectable moves (np.array of booleans of dimension n_strategies (opponent's move), n_strategies)
+        """
 
-        if to_share > 0:
+        values = {
 
-            if price0 == price1:
-                n_consumers[:] += to_share / 2
+            Move.max_profit: self.profit_based_values,
+            Move.max_diff: self.diff_based_values,
+            Move.equal_sharing: self.equal_sharing_values,
+            Move.strategic: self.profit_strategic_based_values
 
-            else:
-                n_consumers[int(price1 < price0)] += to_share
+        }[self.parameters.move]()
 
-        return n_consumers
+        return values == np.max(values, axis=1, keepdims=True)
 
-    def move_profit_based(self, opp_move):
+    def profit_based_values(self):
 
         """
-        Select the move that give the maximum profit at t
-        :param opp_move: Move of the opponent (int)
-        :return: Selected move (int)
+        Value of each move given each move of the opponent: expected profit at t
+        :return: Values (np.array of dimension n_strategies (opponent's move), n_strategies)
         """
 
-        exp_profits = np.zeros(self.n_strategies)
-
-        for i in range(self.n_strategies):
-            exp_profits[i] = self.profits_given_position_and_price(i, opp_move)[0]
-
-        max_profits = max(exp_profits)
-
-        idx = np.flatnonzero(exp_profits == max_profits)
-
-        i = np.random.choice(idx)
+        return self.exp_profits[:, :, 0].T
 
-        return i
+    def diff_based_values(self):
 
-    def move_diff_based(self, opp_move):
-
-        exp_profits = np.zeros((self.n_strategies, 2))
+        """
+        Value of each move given each move of the opponent: expected difference of profits at t
+        :return: Values (np.array of dimension n_strategies (opponent's move), n_strategies)
+        """
 
-        for i in range(self.n_strategies):
-            exp_profits[i, :] = self.profits_given_position_and_price(i, opp_move)
+        return (self.exp_profits[:, :, 0] - self.exp_profits[:, :, 1]).T
 
-        profits_differences = exp_profits[:, 0] - exp_profits[:, 1]
-        max_profits_difference = max(profits_differences)
+    def equal_sharing_values(self):
 
-        # noinspection PyTypeChecker
-        idx = np.flatnonzero(profits_differences == max_profits_difference)
+        """
+        Value of each move given each move of the opponent: opposite of the sum of the distances
+        between the expected profits of each firm and their maximal expected profits at t
+        :return: Values (np.array of dimension n_strategies (opponent's move), n_strategies)
+        """
 
-        return np.random.choice(idx)
+        max_profits = np.max(self.exp_profits, axis=0)
+        sum_diff = np.sum(self.exp_profits - max_profits, axis=2)
 
-    def move_profit_strategic_based(self, opp_move):
+        return sum_diff.T
 
-        values = np.zeros(self.n_strategies)
+    def compute_follow_up_profits(self):
 
-        profits_t_plus = np.zeros((self.n_strategies, 2))
+        """
+        For each move, compute the best responses of the opponent if it maximizes its profit at t+1,
+        and the mean profit that the firm can expect from them.
+        :return: Best responses of the opponent (np.array of booleans of dimension n_strategies, n_strategies (opponent's
+        move)) and mean expected profits at t+1 (np.array of length n_strategies)
+        """
 
-        for i in range(self.n_strategies):
-            profits_t = self.profits_given_position_and_price(i, opp_move)[0]
-            for j in range(self.n_strategies):
-                profits_t_plus[j] = self.profits_given_position_and_price(i, j)
+        opp_profits = self.exp_profits[:, :, 1]
+        opp_best_responses = opp_profits == np.max(opp_profits, axis=1, keepdims=True)
 
-            max_profits_opp = max(profits_t_plus[:, 1])
-            mean_profits_t_plus = np.mean(profits_t_plus[profits_t_plus[:, 1] == max_profits_opp, 0])
-            values[i] = profits_t + mean_profits_t_plus
+        follow_up_profits = \
+            np.sum(self.exp_profits[:, :, 0] * opp_best_responses, axis=1) / np.sum(opp_best_responses, axis=1)
 
-        max_value = max(values)
+        return opp_best_responses, follow_up_profits
 
-        idx = np.flatnonzero(values == max_value)
+    def profit_strategic_based_values(self):
 
-        return np.random.choice(idx)
+        """
+        Value of each move given each move of the opponent: expected profit at t
+        plus mean expected profit at t+1 after the best responses of the opponent
+        :return: Values (np.array of dimension n_strategies (opponent's move), n_strategies)
+        """
 
-    def move_equal_sharing(self, opp_move):
+        follow_up_profits = self.compute_follow_up_profits()[1]
 
-        exp_profits = np.zeros((self.n_strategies, 2))
+        return self.exp_profits[:, :, 0].T + follow_up_profits
 
-        for i in range(self.n_strategies):
-            exp_profits[i] = self.profits_given_position_and_price(i, opp_move)
+    def move(self, opp_move):
 
-        max_profits = np.max(exp_profits, axis=0)
-        sum_diff = np.sum(exp_profits - max_profits, axis=1)
+        """
+        Select randomly one of the best responses of the heuristic to the move of the opponent
+        :param opp_move: Move of the opponent (int)
+        :return: Selected move (int)
+        """
 
-        max_value = max(sum_diff)
+        best_responses = np.flatnonzero(self.best_responses[opp_move])
 
-        idx = np.flatnonzero(sum_diff == max_value)
+        if len(best_responses) == 1:
+            return best_responses[0]
 
-        return np.random.choice(idx)
+        return best_responses[self.rng.integers(len(best_responses))]
 
     def run(self):
         
         """
         Run simulation of an economy.
+        Stop as soon as the economy is caught in a deterministic cycle (e.g. both firms keeping the same moves),
+        the remaining time steps being then filled by repeating the cycle.
         :return: A backup (arbitrary Python object)
         """
         
         # For recording
-        positions = np.zeros((self.t_max, 2), dtype=int)
-        prices = np.zeros((self.t_max, 2))
-        n_consumers = np.zeros((self.t_max, 2))
-        profits = np.zeros((self.t_max, 2))
+        recorded_moves = np.zeros((self.t_max, 2), dtype=int)
 
         moves = np.zeros(2, dtype=int)
 
         active = 0
 
-        moves[:] = -99, np.random.randint(low=0, high=self.n_prices * self.n_positions)
+        moves[:] = -99, self.rng.integers(self.n_strategies)
+
+        # States reached since the last random choice, with the time step at which they were reached:
+        # if one of them is reached again, the dynamics will cycle deterministically
+        visited = {}
+
+        t_convergence, period = None, None
 
         for t in range(self.t_max):
 
             passive = (active + 1) % 2  # Get passive id
 
-            moves[active] = self.move(moves[passive])  # Make play active firm
+            state = moves[0], moves[1], active
+
+            if state in visited:
 
-            move0, move1 = moves  # Useful for call of functions
+                t_convergence = t
+                period = t - visited[state]
+
+                # Extrapolate the cycle for the remaining time steps
+                idx = visited[state] + (np.arange(t, self.t_max) - visited[state]) % period
+
+                recorded_moves[t:] = recorded_moves[idx]
+                break
+
+            if np.count_nonzero(self.best_responses[moves[passive]]) == 1:
+                visited[state] = t
+
+            else:
+                visited.clear()
+
+            moves[active] = self.move(moves[passive])  # Make play active firm
 
             # Record for further analysis
-            positions[t, :] = self.strategies[moves, 0]
-            prices[t, :] = self.prices[self.strategies[moves, 1]]
-            n_consumers[t, :] = self.get_n_consumers_given_moves(move0=move0, move1=move1)
-            profits[t, :] = self.profits_given_position_and_price(
-                move0=move0, move1=move1, n_consumers=n_consumers[t, :])
+            recorded_moves[t] = moves
 
             active = passive  # Inverse role
 
-        return backup.RunBackup(
-            parameters=self.parameters, positions=positions, prices=prices, profits=profits, n_consumers=n_consumers)
+        return self.encode(recorded_moves, t_convergence=t_convergence, period=period)
+
+    def encode(self, moves, t_convergence=None, period=None):
+
+        """
+        Get the compact backup of a trajectory
+        :param moves: Moves of the two firms at each time step (np.array of dimension ..., 2)
+        :param t_convergence: Time step from which the economy is caught in a deterministic cycle (int or None)
+        :param period: Period of this cycle (int or None)
+        :return: A backup (arbitrary Python object)
+        """
+
+        dtypes = backup.compact_dtypes(self.n_positions, self.n_prices)
+
+        # Numbers of consumers are multiples of 0.5
+        half_n_consumers = 2 * self.exp_n_consumers[moves[..., 0], moves[..., 1]]
+
+        return backup.CompactRunBackup(
+            parameters=self.parameters,
+            positions=self.strategies[moves, 0].astype(dtypes["positions"]),
+            price_indices=self.strategies[moves, 1].astype(dtypes["price_indices"]),
+            half_n_consumers=half_n_consumers.astype(dtypes["half_n_consumers"]),
+            prices_grid=self.prices, t_convergence=t_convergence, period=period)
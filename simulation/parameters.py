@@ -23,10 +23,13 @@ from simulation import model
 class Parameters:
 
     def __init__(self, r=0.5, seed=0, n_positions=20, n_prices=10, p_min=1, p_max=2, t_max=25,
-                 move=model.Move.max_profit):
+                 move=model.Move.max_profit, seed_entropy=None):
 
         self.r = r
+
+        # If 'seed_entropy' is given, 'seed' is the index of a child of the root seed sequence having this entropy
         self.seed = seed
+        self.seed_entropy = seed_entropy
 
         self.n_positions = n_positions
         self.n_prices = n_prices
@@ -46,15 +49,376 @@ class Parameters:
         assert self.n_positions > 2, "'n_positions' have to be superior to 2."
         assert self.n_prices > 2, "'n_prices' have to be superior to 2."
         assert self.t_max > 2, "'t_max' have to be superior to 2."
-        assert 0 < self.seed < 2**32-1, "'seed' have to be comprised between 0 and 2^32 - 1."
+        assert 0 <= self.seed, "'seed' have to be a non-negative integer."
+        assert self.seed_entropy is None or 0 <= self.seed_entropy, \
+            "'seed_entropy' have to be a non-negative integer."
         assert 0 < self.r <= 1, "'r' have to be comprised between 0 and 1."
 
+    def seed_sequence(self):
+
+        """
+        Seed sequence from which the random generator of the model is initialized
+        :return: Seed sequence (np.random.SeedSequence)
+        """
+
+        if self.seed_entropy is None:
+            return np.random.SeedSequence(self.seed)
+
+        # Same as the child of index 'seed' of the root sequence
+        return np.random.SeedSequence(self.seed_entropy, spawn_key=(self.seed, ))
+
     def dict(self):
         dic = {i: j for i, j in self.__dict__.items() if not i.startswith("__")}
         dic["move"] = str(dic["move"]).replace("Move.", "")
         return dic
 
 
+class ParameterTable:
+
+    """
+    Parameters of several runs stored by columns (one array per parameter, 'move' being the index of the heuristic
+    in 'model.Move'), instead of one 'Parameters' object per run: the whole table is checked at once,
+    and slicing it (e.g. in chunks sent to worker processes) only creates views on the columns.
+    Indexing it with an integer gives the parameters of a run, as a 'Parameters' object.
+    """
+
+    columns = "r", "seed", "move", "n_positions", "n_prices", "p_min", "p_max", "t_max"
+    moves = tuple(model.Move)
+
+    def __init__(self, r, seed, move=model.Move.max_profit, n_positions=20, n_prices=10, p_min=1, p_max=2, t_max=25,
+                 seed_entropy=None):
+
+        """
+        Each parameter is given for each run (array) or for all the runs (scalar)
+        :param move: Heuristic ('model.Move', or its name) or index of the heuristic for each run (array)
+        :param seed_entropy: Entropy of the root seed sequence of all the runs (int or None; see 'Parameters')
+        """
+
+        self.r = np.asarray(r, dtype=float)
+
+        n_rows = len(self.r)
+
+        def column(values, dtype):
+            # A value shared by all the runs is broadcast, without copying it
+            return np.broadcast_to(np.asarray(values, dtype=dtype), (n_rows, ))
+
+        if isinstance(move, (model.Move, str)):
+            move = self.moves.index(model.Move[str(move).replace("Move.", "")])
+
+        self.seed = column(seed, np.int64)
+        self.move = column(move, np.int8)
+
+        self.n_positions = column(n_positions, int)
+        self.n_prices = column(n_prices, int)
+        # Prices bounds keep their type (int or float), as in the json files
+        self.p_min = column(p_min, None)
+        self.p_max = column(p_max, None)
+        self.t_max = column(t_max, int)
+
+        self.seed_entropy = seed_entropy
+
+        self.check()
+
+    def check(self):
+
+        assert np.all(self.p_min < self.p_max), "'p_min' have to be inferior to 'p_max'."
+        assert np.all(self.n_positions > 2), "'n_positions' have to be superior to 2."
+        assert np.all(self.n_prices > 2), "'n_prices' have to be superior to 2."
+        assert np.all(self.t_max > 2), "'t_max' have to be superior to 2."
+        assert np.all(0 <= self.seed), "'seed' have to be a non-negative integer."
+        assert self.seed_entropy is None or 0 <= self.seed_entropy, \
+            "'seed_entropy' have to be a non-negative integer."
+        assert np.all((0 < self.r) & (self.r <= 1)), "'r' have to be comprised between 0 and 1."
+        assert np.all((0 <= self.move) & (self.move < len(self.moves))), "'move' have to be the index of a heuristic."
+
+    @classmethod
+    def from_json(cls, j_param):
+
+        """
+        :param j_param: Parameters of a pool as loaded from a json file (dictionary)
+        :return: Parameters of each run of the pool (arbitrary Python object)
+        """
+
+        seeds, seed_entropy = extract_seeds(j_param)
+
+        if type(seeds) == range:
+            seeds = np.arange(seeds.start, seeds.stop)
+
+        return cls(
+            r=j_param["r"], seed=seeds, move=j_param["move"],
+            n_positions=j_param["n_positions"], n_prices=j_param["n_prices"],
+            p_min=j_param["p_min"], p_max=j_param["p_max"], t_max=j_param["t_max"],
+            seed_entropy=seed_entropy)
+
+    def __len__(self):
+        return len(self.r)
+
+    def __reduce__(self):
+
+        # Columns shared by all the runs are pickled as a single value
+        values = (
+            column[0] if len(column) and column.strides == (0, ) else column
+            for column in (getattr(self, c) for c in self.columns))
+
+        return ParameterTable, tuple(values) + (self.seed_entropy, )
+
+    def _row(self, r, seed, move, n_positions, n_prices, p_min, p_max, t_max):
+
+        return Parameters(
+            r=r, seed=seed, n_positions=n_positions, n_prices=n_prices, p_min=p_min, p_max=p_max, t_max=t_max,
+            move=self.moves[move], seed_entropy=self.seed_entropy)
+
+    def __getitem__(self, key):
+
+        """
+        :param key: Index of a run (int), or anything that can index an array
+        :return: Parameters of the run (arbitrary Python object), or table of the selected runs
+        """
+
+        if isinstance(key, (int, np.integer)):
+            return self._row(*(getattr(self, column)[key].item() for column in self.columns))
+
+        return ParameterTable(
+            **{column: getattr(self, column)[key] for column in self.columns}, seed_entropy=self.seed_entropy)
+
+    def __iter__(self):
+
+        for values in zip(*(getattr(self, column).tolist() for column in self.columns)):
+            yield self._row(*values)
+
+    def chunks(self, chunk_size):
+
+        """
+        Split the table in consecutive chunks
+        :param chunk_size: Maximum number of runs by chunk (int)
+        :return: Iterator over the chunks (tables)
+        """
+
+        for start in range(0, len(self), chunk_size):
+            yield self[start:start + chunk_size]
+
+    def tables_keys(self):
+
+        """
+        Key identifying the tables of the model of each run (as 'model.tables_key') and its heuristic
+        :return: Keys (np.array of dimension n_rows, 6)
+        """
+
+        return np.column_stack((
+            (self.r * self.n_positions).astype(int), self.n_positions, self.n_prices, self.p_min, self.p_max,
+            self.move))
+
+
+def _axis_values(value):
+
+    """
+    Values of a parameter in a sweep specification
+    :param value: Single value, list of values, or {"range": [start, stop, step]} or {"linspace": [start, stop, num]}
+    :return: Values (np.array)
+    """
+
+    if type(value) == dict:
+
+        if "range" in value:
+            return np.arange(*value["range"])
+
+        if "linspace" in value:
+            start, stop, num = value["linspace"]
+            return np.linspace(start, stop, int(num))
+
+        raise ValueError("Unknown specification of values: {}.".format(value))
+
+    return np.atleast_1d(np.asarray(value))
+
+
+class Sweep:
+
+    """
+    Parameters of runs given by a specification, expanded lazily (chunk by chunk, and never as a whole):
+    every combination of the values of the parameters (Cartesian product) is repeated 'repeat' times,
+    'r' being possibly drawn at random for each run instead. For instance:
+        {
+            "n_positions": [21, 41], "n_prices": 11, "p_min": 1, "p_max": 11, "t_max": 25,
+            "move": ["max_profit", "max_diff"],
+            "r": {"uniform": [0, 1], "entropy": 123} (or [0.25, 0.50], {"linspace": [0.05, 1, 20]}, ...),
+            "repeat": 1000,
+            "seed": {"entropy": 456}
+        }
+    Each value can be a single value, a list, {"range": [start, stop, step]} or {"linspace": [start, stop, num]}.
+    The seed of a run is its index in the sweep (see 'Parameters', and 'spawn_range' for starting from another index),
+    and random values only depend on it: the parameters of a run do not depend on the way the sweep is split.
+    A sweep whose settings (all the parameters but 'r') have a single value is a pool (see 'pools').
+    """
+
+    settings = "n_positions", "n_prices", "p_min", "p_max", "t_max", "move"
+
+    # Random values are drawn by blocks of runs, each one with its own generator
+    block_size = 1024
+
+    def __init__(self, spec):
+
+        """
+        :param spec: Specification of the sweep (dictionary)
+        """
+
+        self.spec = spec
+
+        # Parameters whose values are combined, in the order of the dimensions of the sweep
+        self.axes = {name: _axis_values(spec[name]) for name in self.settings}
+
+        self.axes["move"] = np.array([ParameterTable.moves.index(model.Move[m]) for m in self.axes["move"]])
+
+        self.random_r = type(spec["r"]) == dict and "uniform" in spec["r"]
+
+        if not self.random_r:
+            self.axes["r"] = _axis_values(spec["r"])
+
+        self.repeat = spec.get("repeat", 1)
+        self.shape = tuple(len(values) for values in self.axes.values()) + (self.repeat, )
+
+        self.seed_entropy = spec["seed"]["entropy"]
+        self.first_seed, last_seed = spec["seed"].get("spawn_range", (0, None))
+
+        assert last_seed is None or last_seed - self.first_seed == len(self), \
+            "'spawn_range' have to give a seed for each run."
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def n_pools(self):
+
+        """
+        Number of combinations of the settings (int)
+        """
+
+        return int(np.prod([len(self.axes[name]) for name in self.settings]))
+
+    def _draw_r(self, seeds):
+
+        """
+        :param seeds: Seeds of the runs (np.array)
+        :return: Random 'r' of each run (np.array)
+        """
+
+        low, high = self.spec["r"]["uniform"]
+        r = np.zeros(len(seeds))
+
+        blocks = seeds // self.block_size
+
+        for block in np.unique(blocks):
+
+            rng = np.random.default_rng(np.random.SeedSequence(self.spec["r"]["entropy"], spawn_key=(int(block), )))
+            in_block = blocks == block
+
+            r[in_block] = rng.uniform(low, high, size=self.block_size)[seeds[in_block] % self.block_size]
+
+        return r
+
+    def __getitem__(self, key):
+
+        """
+        :param key: Index of a run (int), slice, or indices of runs (array of integers or booleans)
+        :return: Parameters of the run (arbitrary Python object), or table of the selected runs
+        """
+
+        if isinstance(key, (int, np.integer)):
+            return self[np.array([key])][0]
+
+        if isinstance(key, slice):
+            indices = np.arange(*key.indices(len(self)))
+
+        else:
+            key = np.asarray(key)
+            indices = np.flatnonzero(key) if key.dtype == bool else key
+
+        coordinates = np.unravel_index(indices, self.shape)
+
+        columns = {name: values[coordinates[i]] for i, (name, values) in enumerate(self.axes.items())}
+
+        seeds = self.first_seed + indices
+
+        if self.random_r:
+            columns["r"] = self._draw_r(seeds)
+
+        return ParameterTable(seed=seeds, seed_entropy=self.seed_entropy, **columns)
+
+    def chunks(self, chunk_size=10000):
+
+        """
+        Expand the sweep in consecutive chunks
+        :param chunk_size: Maximum number of runs by chunk (int)
+        :return: Iterator over the chunks (tables)
+        """
+
+        for start in range(0, len(self), chunk_size):
+            yield self[start:start + chunk_size]
+
+    def __iter__(self):
+
+        for table in self.chunks():
+            yield from table
+
+    def pools(self):
+
+        """
+        Split the sweep in pools, one for each combination of the settings (their runs are consecutive in the sweep)
+        :return: Iterator over the specification of each pool (dictionaries)
+        """
+
+        n_runs = len(self) // self.n_pools
+
+        for k, coordinates in enumerate(np.ndindex(*(len(self.axes[name]) for name in self.settings))):
+
+            settings = {name: self.axes[name][i].item() for name, i in zip(self.settings, coordinates)}
+            settings["move"] = ParameterTable.moves[settings["move"]].name
+
+            first = self.first_seed + k * n_runs
+
+            yield dict(
+                self.spec, **settings,
+                seed={"entropy": self.seed_entropy, "spawn_range": [first, first + n_runs]})
+
+
+def pool_parameters(j_param):
+
+    """
+    :param j_param: Parameters of a pool as loaded from a json file: sweep specification (see 'Sweep'),
+        or 'r' and seeds given for each run (dictionary)
+    :return: Parameters of each run of the pool, expanded lazily for a sweep (arbitrary Python object)
+    """
+
+    if "repeat" in j_param:
+        return Sweep(j_param)
+
+    return ParameterTable.from_json(j_param)
+
+
+def single_pool(j_param):
+
+    """
+    Parameters of a pool whose settings are given as single values: in a sweep specification,
+    settings given as lists of a single value (or ranges...) are reduced to this value
+    :param j_param: Parameters of a pool as loaded from a json file (dictionary)
+    :return: Parameters of the pool, describing the same runs (dictionary)
+    :raises ValueError: If the parameters are the ones of a sweep of several pools
+    """
+
+    if "repeat" not in j_param:
+        return dict(j_param, **{
+            name: j_param[name][0] for name in Sweep.settings
+            if type(j_param[name]) == list and len(j_param[name]) == 1})
+
+    sweep = Sweep(j_param)
+
+    if sweep.n_pools != 1:
+        raise ValueError(
+            "These parameters describe {} pools, whose runs do not share the same settings: "
+            "produce them pool by pool (see 'Sweep.pools' and 'data.produce_pools').".format(sweep.n_pools))
+
+    return next(sweep.pools())
+
+
 def load(json_file):
 
     if not os.path.exists(json_file):
@@ -66,22 +430,36 @@ def load(json_file):
     return j_param
 
 
-def extract_parameters(j_param):
+def extract_seeds(j_param):
+
+    """
+    Get the seed of each run: either given explicitly as a list,
+    or as a root seed sequence ('entropy') and a range of indices of its children ('spawn_range')
+    :param j_param: Parameters as loaded from a json file (dictionary)
+    :return: Seeds (list or range) and entropy of the root seed sequence (int or None)
+    """
 
     if type(j_param["seed"]) == list:
-        return [
-            Parameters(
-                p_min=j_param["p_min"],
-                p_max=j_param["p_max"],
-                n_prices=j_param["n_prices"],
-                n_positions=j_param["n_positions"],
-                t_max=j_param["t_max"],
-                r=j_param["r"][i],
-                seed=j_param["seed"][i],
-                move=getattr(model.Move, j_param["move"])
-            )
-            for i in range(len(j_param["r"]))
-        ]
+        return j_param["seed"], None
+
+    return range(*j_param["seed"]["spawn_range"]), j_param["seed"]["entropy"]
+
+
+def iterate_parameters(j_param):
+
+    """
+    Get the parameters of each run of a pool one by one, without creating them all at once
+    :param j_param: Parameters as loaded from a json file (dictionary)
+    :return: Iterator over the parameters of each run
+    """
+
+    return iter(pool_parameters(j_param))
+
+
+def extract_parameters(j_param):
+
+    if type(j_param["r"]) == list or "repeat" in j_param:
+        return pool_parameters(j_param)
 
     else:
         return Parameters(
@@ -123,8 +501,9 @@ def generate_new_parameters_files():
             "n_prices": n_prices,
             "n_positions": n_positions,
             "t_max": t_max,
-            "seed": [int(i) for i in np.random.randint(low=0, high=2**32-1, size=n_pool)],
-            "r": [float(i) for i in np.random.uniform(low=0, high=1, size=n_pool)],
+            "seed": {"entropy": np.random.SeedSequence().entropy},
+            "r": {"uniform": [0, 1], "entropy": np.random.SeedSequence().entropy},
+            "repeat": n_pool,
             "move": str_move,
         }
 
@@ -140,8 +519,9 @@ def generate_new_parameters_files():
             "n_prices": n_prices,
             "n_positions": n_positions,
             "t_max": t_max,
-            "seed": [int(i) for i in np.random.randint(low=0, high=2**32-1, size=n_batch)],
-            "r": [0.25, ] * (n_batch//2) + [0.50, ] * (n_batch//2),
+            "seed": {"entropy": np.random.SeedSequence().entropy},
+            "r": [0.25, 0.50],
+            "repeat": n_batch // 2,
             "move": str_move,
         }
 
@@ -156,7 +536,7 @@ def generate_new_parameters_files():
                 "n_prices": n_prices,
                 "n_positions": n_positions,
                 "t_max": t_max,
-                "seed": np.random.randint(low=0, high=2**32),
+                "seed": np.random.SeedSequence().entropy,
                 "r": i/100,
                 "move": str_move
             }
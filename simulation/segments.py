@@ -0,0 +1,222 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Run-length encoding of trajectories.
+A run is stored as segments (time steps during which nothing changes) until the time step 't_stored'
+from which it repeats a cycle of the time steps ['t_stored' - 'period', 't_stored') until 't_max'
+('t_stored' = 't_max' and 'period' = 0 if the run is never caught in a deterministic cycle).
+The segments of several runs are stored one run after the other, 'offsets' giving the index of the first segment
+of each run (and the total number of segments as last element).
+"""
+
+import numpy as np
+
+
+def find_starts(*arrays):
+
+    """
+    Find the time steps at which a new segment starts, i.e. at which one of the arrays changes
+    :param arrays: Values at each time step (np.array of dimension t_stored, ...)
+    :return: Time steps (np.array)
+    """
+
+    t_stored = len(arrays[0])
+    changes = np.zeros(max(t_stored - 1, 0), dtype=bool)
+
+    for a in arrays:
+        a = a.reshape(t_stored, -1)
+        changes |= np.any(a[1:] != a[:-1], axis=1)
+
+    return np.flatnonzero(np.concatenate(([t_stored > 0], changes)))
+
+
+def find_starts_of_runs(t_stored, *arrays):
+
+    """
+    Find the segments of several runs at once (as 'find_starts' for each run)
+    :param t_stored: Number of time steps to encode for each run (np.array)
+    :param arrays: Values of each run at each time step (np.array of dimension n_runs, t_max, ...)
+    :return: Index of the run and time step at which each segment starts, one run after the other,
+        and offsets of the segments of each run (tuple of np.array)
+    """
+
+    n_runs, t_max = arrays[0].shape[:2]
+
+    changes = np.zeros((n_runs, t_max), dtype=bool)
+    changes[:, 0] = True
+
+    for a in arrays:
+        a = a.reshape(n_runs, t_max, -1)
+        changes[:, 1:] |= np.any(a[:, 1:] != a[:, :-1], axis=2)
+
+    changes &= np.arange(t_max)[None, :] < t_stored[:, None]
+
+    runs, starts = np.nonzero(changes)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(runs, minlength=n_runs)))).astype(int)
+
+    return runs, starts, offsets
+
+
+def _ends(starts, offsets, t_stored):
+
+    """
+    :return: Time step at which each segment ends (np.array)
+    """
+
+    ends = np.empty(len(starts), dtype=int)
+    ends[:-1] = starts[1:]
+
+    # The last segment of a run ends when the stored time steps end
+    n_segments = np.diff(offsets)
+    has_segments = n_segments > 0
+    ends[offsets[1:][has_segments] - 1] = t_stored[has_segments]
+
+    return ends
+
+
+def runs_of_segments(offsets):
+
+    """
+    :return: Index of the run of each segment (np.array)
+    """
+
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def ranges(first, n_segments):
+
+    """
+    Indices of the segments of several runs, one run after the other
+    :param first: Index of the first segment of each run (np.array)
+    :param n_segments: Number of segments of each run (np.array)
+    :return: Indices of the segments and their offsets (tuple of two np.array)
+    """
+
+    offsets = np.concatenate(([0], np.cumsum(n_segments))).astype(int)
+    indices = np.arange(offsets[-1]) + np.repeat(first - offsets[:-1], n_segments)
+
+    return indices, offsets
+
+
+def decode(values, starts, offsets, t_stored, period, t_max):
+
+    """
+    Get the value of each run at each time step
+    :param values: Value of each segment (np.array of dimension n_segments, ...)
+    :param starts: Time step at which each segment starts (np.array)
+    :param offsets: Offsets of the segments of each run (np.array of length n_runs + 1, starting at 0)
+    :param t_stored: Number of time steps covered by the segments of each run (np.array)
+    :param period: Period of the cycle repeated after them (np.array; 0 if none)
+    :param t_max: Number of time steps (int)
+    :return: Values (np.array of dimension n_runs, t_max, ...)
+    """
+
+    lengths = _ends(starts, offsets, t_stored) - starts
+    rows = np.repeat(np.asarray(values), lengths, axis=0)
+
+    first_row = np.concatenate(([0], np.cumsum(t_stored)[:-1]))
+
+    t = np.arange(t_max)
+    t_stored = t_stored[:, None]
+    p = np.maximum(period, 1)[:, None]
+
+    row = np.where(t < t_stored, t, t_stored - p + (t - t_stored) % p)
+
+    return rows[first_row[:, None] + row]
+
+
+def time_steps(starts, offsets, t_stored, period, t_max, first):
+
+    """
+    Count, for each segment, the time steps from 'first' to the end of its run at which it is the current segment
+    (the segments of the cycle being counted each time the cycle is repeated), in O(number of segments)
+    :param starts: Time step at which each segment starts (np.array)
+    :param offsets: Offsets of the segments of each run (np.array of length n_runs + 1, starting at 0)
+    :param t_stored: Number of time steps covered by the segments of each run (np.array)
+    :param period: Period of the cycle repeated after them (np.array; 0 if none)
+    :param t_max: Number of time steps (int)
+    :param first: First time step to count (int)
+    :return: Number of time steps for each segment (np.array)
+    """
+
+    run = runs_of_segments(offsets)
+
+    ends = _ends(starts, offsets, t_stored)
+    t_stored = t_stored[run]
+    period = period[run]
+
+    # Time steps before the cycle is repeated
+    n_steps = np.maximum(ends - np.maximum(starts, first), 0)
+
+    # Repetitions of the cycle [t_stored - p, t_stored) over [a, t_max): each time step of the cycle is repeated
+    # q times, plus once if its position in the cycle, counted from the one of 'a', is inferior to 'rem'
+    p = np.maximum(period, 1)
+    a = np.maximum(first, t_stored)
+    q, rem = (t_max - a) // p, (t_max - a) % p
+    o = (a - t_stored) % p
+
+    cycle_start = t_stored - p
+    c0 = np.clip(starts - cycle_start, 0, p)
+    c1 = np.maximum(np.clip(ends - cycle_start, 0, p), c0)
+
+    def count(y):
+        # Number of positions d in [0, y) (or minus the number in [y, 0)) with d mod p < rem
+        return (y // p) * rem + np.minimum(y % p, rem)
+
+    def count_from_a(x):
+        # Number of positions c in [0, x) of the cycle with (c - o) mod p < rem
+        return count(x - o) - count(-o)
+
+    n_repeated = q * (c1 - c0) + count_from_a(c1) - count_from_a(c0)
+
+    return n_steps + np.where(period > 0, n_repeated, 0)
+
+
+def _weights(starts, offsets, t_stored, period, t_max, first):
+
+    """
+    :return: Index of the run of each segment, and weight of each segment in the mean of its run (tuple of np.array)
+    """
+
+    return runs_of_segments(offsets), time_steps(starts, offsets, t_stored, period, t_max, first) / (t_max - first)
+
+
+def means(values, starts, offsets, t_stored, period, t_max, first):
+
+    """
+    Mean over the time steps from 'first' to the end of each run, in O(number of segments)
+    :param values: Value of each segment (np.array of length n_segments)
+    :return: Mean for each run (np.array)
+    """
+
+    run, weights = _weights(starts, offsets, t_stored, period, t_max, first)
+
+    return np.bincount(run, weights=weights * values, minlength=len(offsets) - 1)
+
+
+def stds(values, starts, offsets, t_stored, period, t_max, first):
+
+    """
+    Standard deviation over the time steps from 'first' to the end of each run, in O(number of segments)
+    :param values: Value of each segment (np.array of length n_segments)
+    :return: Standard deviation for each run (np.array)
+    """
+
+    run, weights = _weights(starts, offsets, t_stored, period, t_max, first)
+
+    mean = np.bincount(run, weights=weights * values, minlength=len(offsets) - 1)
+
+    return np.sqrt(np.bincount(run, weights=weights * (values - mean[run]) ** 2, minlength=len(offsets) - 1))
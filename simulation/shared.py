@@ -0,0 +1,92 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from multiprocessing import shared_memory
+import numpy as np
+
+
+# Arrays attached by a worker process: description and (shared memory blocks, arrays)
+_attached = {"spec": None, "blocks": [], "arrays": {}}
+
+
+class SharedArrays:
+
+    """
+    Arrays allocated in shared memory by the parent process, to be filled in place by worker processes.
+    To be used as a context manager: the shared memory is released when leaving it.
+    """
+
+    def __init__(self, shapes, dtypes):
+
+        """
+        :param shapes: Shape of each array (dictionary)
+        :param dtypes: Data type of each array (dictionary)
+        """
+
+        self.blocks = {}
+        self.arrays = {}
+
+        for name, shape in shapes.items():
+
+            dtype = np.dtype(dtypes[name])
+            block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+
+            self.blocks[name] = block
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+        # Picklable description, for the workers to attach the arrays
+        self.spec = tuple(
+            (name, self.blocks[name].name, array.shape, array.dtype.str) for name, array in self.arrays.items())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.arrays = {}
+
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+        self.blocks = {}
+
+
+def attach(spec):
+
+    """
+    Get (from a worker process) the arrays described by 'spec', keeping them attached for the next calls
+    :param spec: Description of the arrays ('SharedArrays.spec')
+    :return: Arrays (dictionary)
+    """
+
+    if _attached["spec"] != spec:
+
+        # Detach the arrays of a previous job
+        _attached["arrays"] = {}
+        for block in _attached["blocks"]:
+            block.close()
+
+        # Worker processes share the resource tracker of the parent process, which releases the blocks
+        blocks = [shared_memory.SharedMemory(name=block_name) for name, block_name, shape, dtype in spec]
+
+        _attached["spec"] = spec
+        _attached["blocks"] = blocks
+        _attached["arrays"] = {
+            name: np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            for (name, block_name, shape, dtype), block in zip(spec, blocks)
+        }
+
+    return _attached["arrays"]
@@ -0,0 +1,139 @@
+# SpatialCompetition
+# Copyright (C) 2018  Aurélien Nioche, Basile Garcia & Nicolas Rougier
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import numpy as np
+
+import simulation.backup as backup
+import simulation.segments as segments
+
+
+class Summary:
+
+    """
+    Summary statistics of a pool, updated chunk by chunk: mean and standard deviation of the mean distance, price and
+    profit over the last time steps of each run, for all the runs and for bins of 'r' (as in 'analysis.simulation').
+    """
+
+    variables = "distance", "price", "profit"
+
+    def __init__(self, n_positions, t_max, prices_grid, n_bins=50, span_ratio=0.33):
+
+        self.n_positions = n_positions
+        self.t_max = t_max
+        self.prices_grid = prices_grid
+
+        # How many time steps from the end of the simulation are included
+        self.span = int(span_ratio * t_max)
+
+        self.boundaries = np.linspace(0, 1, n_bins + 1)
+
+        # For each bin: number of runs, mean and sum of squared deviations of each variable
+        self.n = np.zeros(n_bins, dtype=int)
+        self.mean = np.zeros((n_bins, len(self.variables)))
+        self.m2 = np.zeros((n_bins, len(self.variables)))
+
+    def update(self, r, columns):
+
+        """
+        :param r: 'r' of each run (np.array)
+        :param columns: Columns of the runs (dictionary of np.array; see 'backup.run_columns')
+        """
+
+        def mean(variable):
+            return backup.reduce_segments(
+                segments.means, variable, columns, self.t_max, self.prices_grid, span=self.span)
+
+        x = np.column_stack((mean("distance") / self.n_positions, mean("prices"), mean("profits")))
+
+        # First bin whose upper boundary is superior or equal to 'r'
+        bins = np.searchsorted(self.boundaries[1:], r)
+        n_bins = len(self.n)
+
+        n = np.bincount(bins, minlength=n_bins)
+        in_chunk = n > 0
+
+        with np.errstate(invalid="ignore"):
+            mean = np.column_stack([np.bincount(bins, weights=x[:, j], minlength=n_bins) for j in range(x.shape[1])])
+            mean /= n[:, None]
+
+        m2 = np.column_stack([
+            np.bincount(bins, weights=(x[:, j] - mean[bins, j]) ** 2, minlength=n_bins) for j in range(x.shape[1])])
+
+        # Merge the statistics of the chunk with the ones of the previous runs, bin by bin (Chan et al.)
+        total = self.n[in_chunk] + n[in_chunk]
+        delta = mean[in_chunk] - self.mean[in_chunk]
+
+        self.m2[in_chunk] += m2[in_chunk] + delta ** 2 * (self.n[in_chunk] * n[in_chunk] / total)[:, None]
+        self.mean[in_chunk] += delta * (n[in_chunk] / total)[:, None]
+        self.n[in_chunk] = total
+
+    def _total(self):
+
+        """
+        Merge the statistics of all the bins
+        :return: Number of runs, mean and sum of squared deviations (tuple)
+        """
+
+        n = np.sum(self.n)
+
+        if n == 0:
+            return 0, np.full(len(self.variables), np.nan), np.zeros(len(self.variables))
+
+        mean = self.n @ self.mean / n
+        m2 = np.sum(self.m2, axis=0) + self.n @ (self.mean - mean) ** 2
+
+        return n, mean, m2
+
+    def dict(self):
+
+        """
+        :return: Statistics, undefined ones (e.g. for bins without runs) being None (dictionary)
+        """
+
+        n, mean, m2 = self._total()
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(m2 / n)
+            bins_mean = np.where(self.n[:, None] > 0, self.mean, np.nan)
+            bins_std = np.sqrt(self.m2 / self.n[:, None])
+
+        return {
+            "n_runs": int(n),
+            "mean": dict(zip(self.variables, _values(mean))),
+            "std": dict(zip(self.variables, _values(std))),
+            "bins": {
+                "boundaries": self.boundaries.tolist(),
+                "n_runs": self.n.tolist(),
+                "mean": {v: _values(bins_mean[:, j]) for j, v in enumerate(self.variables)},
+                "std": {v: _values(bins_std[:, j]) for j, v in enumerate(self.variables)}
+            }
+        }
+
+    def save(self, file_name):
+
+        # NaN is not valid json
+        with open(file_name, "w") as f:
+            json.dump(self.dict(), f, indent=2, allow_nan=False)
+
+
+def _values(array):
+
+    """
+    :param array: Values (np.array)
+    :return: Values, None for NaN (list)
+    """
+
+    return [None if np.isnan(x) else x for x in array.tolist()]
@@ -0,0 +1,52 @@
+import json
+import pytest
+
+import simulation.model as model
+import simulation.parameters as parameters
+
+
+@pytest.fixture
+def pool_spec():
+
+    """
+    Specification of a small pool, as in the json files of 'simulation/results/json'
+    """
+
+    return {
+        "n_positions": 11, "n_prices": 11, "p_min": 1, "p_max": 11, "t_max": 25, "move": "max_diff",
+        "r": {"uniform": [0, 1], "entropy": 123}, "repeat": 60, "seed": {"entropy": 456}
+    }
+
+
+@pytest.fixture
+def table(pool_spec):
+
+    return parameters.Sweep(pool_spec)[:]
+
+
+@pytest.fixture
+def parameters_file(tmp_path, monkeypatch, pool_spec):
+
+    """
+    Parameters file of the pool, the results (and the cache) being written in a temporary directory
+    """
+
+    monkeypatch.chdir(tmp_path)
+
+    file_name = tmp_path / "simulation" / "results" / "json" / "pool_max_diff.json"
+    file_name.parent.mkdir(parents=True)
+
+    with open(file_name, "w") as f:
+        json.dump(pool_spec, f)
+
+    return str(file_name)
+
+
+@pytest.fixture
+def dense_runs(table):
+
+    """
+    Backup of each run of the pool, as given by the model
+    """
+
+    return [model.Model(param).run() for param in table]
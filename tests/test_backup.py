@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import simulation.data as data
+
+
+@pytest.fixture
+def pool_backup(parameters_file):
+
+    return data.produce_data(parameters_file, "simulation/results/npy/pool_max_diff", use_lockstep=True)
+
+
+def test_columns_give_back_the_runs(pool_backup, table, dense_runs):
+
+    for field in "positions", "prices", "n_consumers", "profits":
+        expected = np.array([getattr(b, field) for b in dense_runs])
+        assert np.array_equal(np.asarray(getattr(pool_backup, field)[...]), expected)
+
+    assert np.array_equal(pool_backup.r, table.r)
+    assert np.array_equal(pool_backup.seed, table.seed)
+
+
+@pytest.mark.parametrize("span", [None, 1, 8, 25])
+def test_mean_and_std_are_the_ones_of_the_dense_arrays(pool_backup, span):
+
+    first = 0 if span is None else pool_backup.t_max - span
+
+    for variable in "prices", "profits", "n_consumers":
+
+        dense = np.mean(np.asarray(getattr(pool_backup, variable)[...], dtype=float), axis=2)[:, first:]
+
+        assert np.allclose(pool_backup.mean(variable, span), np.mean(dense, axis=1))
+        assert np.allclose(pool_backup.std(variable, span), np.std(dense, axis=1))
+
+    positions = np.asarray(pool_backup.positions[...], dtype=int)[:, first:]
+    distance = np.absolute(positions[:, :, 0] - positions[:, :, 1])
+
+    assert np.allclose(pool_backup.mean("distance", span), np.mean(distance, axis=1))
+    assert np.allclose(pool_backup.std("distance", span), np.std(distance, axis=1))
+
+
+def test_mean_of_some_runs(pool_backup):
+
+    runs = np.array([5, 2, 40])
+
+    assert np.array_equal(pool_backup.mean("profits", 8, runs=runs), pool_backup.mean("profits", 8)[runs])
+    assert pool_backup.run_backup(2).mean("profits", 8) == pytest.approx(pool_backup.mean("profits", 8)[2])
@@ -0,0 +1,48 @@
+import numpy as np
+
+import simulation.backup as backup
+import simulation.cache as cache
+
+
+def test_result_cache_gives_back_the_runs_it_has(tmp_path, table, dense_runs):
+
+    result_cache = cache.ResultCache(directory=str(tmp_path / "cache"))
+
+    keys = cache.run_keys(table)
+
+    assert len(set(keys)) == len(table)
+    assert keys[0] == cache.run_key(table[0])
+
+    found, columns = result_cache.get(keys)
+
+    assert not np.any(found) and columns is None
+    assert keys[0] not in result_cache
+
+    # Two chunks, put in the cache one after the other
+    encoded = [backup.CompressedRunBackup.encode(b) for b in dense_runs]
+
+    result_cache.put(keys[:20], backup.concatenate_segments(encoded[:20]))
+    result_cache.put(keys[40:], backup.concatenate_segments(encoded[40:]))
+
+    assert keys[0] in result_cache
+    assert keys[20] not in result_cache
+
+    # Runs asked in another order than the one of their chunks
+    asked = [45, 3, 25, 0, 59]
+    found, columns = result_cache.get([keys[i] for i in asked])
+
+    assert np.array_equal(found, [True, True, False, True, True])
+
+    expected = backup.concatenate_segments([encoded[i] for i in (45, 3, 0, 59)])
+
+    for column in backup.run_columns:
+        assert np.array_equal(columns[column], expected[column])
+
+
+def test_keys_depend_on_the_version_of_the_model(table, monkeypatch):
+
+    key = cache.run_key(table[0])
+
+    monkeypatch.setattr(cache, "fingerprint", lambda: "another version")
+
+    assert cache.run_key(table[0]) != key
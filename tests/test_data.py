@@ -0,0 +1,67 @@
+import json
+import numpy as np
+import pytest
+
+import simulation.data as data
+
+
+data_file = "simulation/results/npy/pool_max_diff"
+
+
+def test_interrupted_production_resumes_from_the_cache(parameters_file, dense_runs, monkeypatch):
+
+    # Production interrupted at the third chunk
+    run_lockstep = data.run_lockstep
+    n_runs = []
+
+    def interrupted(table):
+        if len(n_runs) == 2:
+            raise KeyboardInterrupt
+        n_runs.append(len(table))
+        return run_lockstep(table)
+
+    monkeypatch.setattr(data, "run_lockstep", interrupted)
+
+    with pytest.raises(KeyboardInterrupt):
+        data.produce_data(parameters_file, data_file, use_lockstep=True, chunk_size=10)
+
+    # Only the runs of the chunks that were not completed are computed again
+    n_runs.clear()
+
+    def counted(table):
+        n_runs.append(len(table))
+        return run_lockstep(table)
+
+    monkeypatch.setattr(data, "run_lockstep", counted)
+
+    pool_backup = data.produce_data(parameters_file, data_file, use_lockstep=True, chunk_size=10)
+
+    assert n_runs == [10] * 4
+    assert np.array_equal(np.asarray(pool_backup.positions[...]), np.array([b.positions for b in dense_runs]))
+
+
+def test_production_modes_give_the_same_runs(parameters_file):
+
+    reference = data.produce_data(parameters_file, data_file, use_lockstep=True, force=True)
+
+    for use_shared_memory in (False, True):
+
+        pool_backup = data.produce_data(
+            parameters_file, data_file, use_shared_memory=use_shared_memory, force=True, chunk_size=25)
+
+        for column in "offsets", "starts", "segment_positions", "t_convergence", "period":
+            assert np.array_equal(getattr(pool_backup, column), getattr(reference, column))
+
+
+def test_production_keeps_the_pools_loaded_before(parameters_file, pool_spec):
+
+    pool_backup = data.produce_data(parameters_file, data_file, use_lockstep=True)
+    r = np.array(pool_backup.r)
+
+    with open(parameters_file, "w") as f:
+        json.dump(dict(pool_spec, r={"uniform": [0, 1], "entropy": 789}), f)
+
+    new_backup = data.produce_data(parameters_file, data_file, use_lockstep=True)
+
+    assert np.array_equal(pool_backup.r, r)
+    assert not np.array_equal(new_backup.r, r)
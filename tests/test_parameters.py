@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import simulation.model as model
+import simulation.parameters as parameters
+
+
+def test_runs_do_not_depend_on_the_way_the_sweep_is_split(pool_spec):
+
+    sweep = parameters.Sweep(pool_spec)
+    table = sweep[:]
+
+    assert len(sweep) == len(table) == 60
+
+    chunks = list(sweep.chunks(7))
+
+    assert np.array_equal(np.concatenate([chunk.r for chunk in chunks]), table.r)
+    assert np.array_equal(np.concatenate([chunk.seed for chunk in chunks]), table.seed)
+
+    indices = np.array([59, 0, 31])
+    selected = sweep[indices]
+
+    for i, j in enumerate(indices):
+        assert sweep[int(j)].dict() == table[int(j)].dict() == selected[i].dict()
+
+
+def test_sweep_expands_every_combination_of_the_settings(pool_spec):
+
+    spec = dict(pool_spec, n_positions=[11, 21], move=["max_profit", "max_diff"], repeat=5)
+    sweep = parameters.Sweep(spec)
+
+    assert len(sweep) == 20 and sweep.n_pools == 4
+
+    with pytest.raises(ValueError):
+        parameters.single_pool(spec)
+
+    pools = list(sweep.pools())
+    table = sweep[:]
+
+    for k, spec_k in enumerate(pools):
+
+        pool = parameters.Sweep(parameters.single_pool(spec_k))[:]
+
+        assert np.array_equal(pool.r, table.r[5 * k:5 * (k + 1)])
+        assert np.array_equal(pool.seed, table.seed[5 * k:5 * (k + 1)])
+        assert set(pool.n_positions) == {spec_k["n_positions"]}
+
+
+def test_runs_are_reproducible(pool_spec):
+
+    table = parameters.Sweep(pool_spec)[:]
+
+    first = model.Model(table[3]).run()
+    again = model.Model(parameters.Sweep(pool_spec)[3]).run()
+    other = model.Model(table[4]).run()
+
+    assert np.array_equal(first.positions, again.positions)
+    assert np.array_equal(first.prices, again.prices)
+    assert not np.array_equal(first.positions, other.positions)
+
+    # 'r' drawn at random only depends on the seed of the run
+    assert table.r[3] == parameters.Sweep(dict(pool_spec, repeat=4))[3].r
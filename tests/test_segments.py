@@ -0,0 +1,49 @@
+import numpy as np
+
+import simulation.backup as backup
+import simulation.segments as segments
+
+
+def test_decode_gives_back_the_dense_arrays():
+
+    rng = np.random.default_rng(0)
+
+    # Values changing at a few time steps only
+    n_runs, t_max = 20, 30
+    changes = rng.random((n_runs, t_max, 1)) < 0.2
+    values = np.cumsum(changes * rng.integers(1, 5, size=(n_runs, t_max, 2)), axis=1).astype(np.uint8)
+
+    t_stored = np.full(n_runs, t_max)
+    runs, starts, offsets = segments.find_starts_of_runs(t_stored, values)
+
+    assert len(starts) < n_runs * t_max
+
+    decoded = segments.decode(values[runs, starts], starts, offsets, t_stored, np.zeros(n_runs, dtype=int), t_max)
+
+    assert np.array_equal(decoded, values)
+
+
+def test_encoded_runs_give_back_their_trajectories(dense_runs):
+
+    for run_backup in dense_runs:
+
+        encoded = backup.CompressedRunBackup.encode(run_backup)
+
+        for field in "positions", "prices", "n_consumers", "profits":
+            assert np.array_equal(getattr(encoded, field), getattr(run_backup, field))
+
+
+def test_columns_give_back_the_trajectories_of_each_run(table, dense_runs):
+
+    columns = backup.concatenate_segments([backup.CompressedRunBackup.encode(b) for b in dense_runs])
+
+    # Deterministic cycles are only stored once
+    assert np.any(columns["t_convergence"] >= 0)
+
+    runs = np.array([3, 0, 17])
+    selected = backup.take_runs(columns, runs)
+    arguments = backup._segment_arguments(selected, t_max=table[0].t_max)
+
+    decoded = segments.decode(selected["segment_positions"], **arguments)
+
+    assert np.array_equal(decoded, np.array([dense_runs[i].positions for i in runs]))